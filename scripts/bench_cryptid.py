@@ -0,0 +1,100 @@
+"""Measure what saving and opening a vault costs in time and memory.
+
+Run from the repository root, e.g. `python -m scripts.bench_cryptid --entries 500000`.
+Each step runs in a fresh process, so peaks don't carry over from one to another.
+Peak RSS is read from `/proc`, so it's only reported on Linux.
+"""
+
+import argparse
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+from secrets import token_urlsafe
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from src.models import cryptid, kdf
+from src.models.db import Glue
+
+SPEC = {"name": "pbkdf2", "iterations": 1_000}  # The KDF isn't what's measured here.
+
+
+def peak_rss() -> int | None:
+    """The peak resident set size of this process in bytes, if known."""
+    status = Path("/proc/self/status")
+    if not status.exists():
+        return None
+    for line in status.read_text().splitlines():
+        if line.startswith("VmHWM"):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+def make_image(path: Path, entries: int) -> None:
+    """Store a serialized database with `entries` random secrets at `path`."""
+    glue = Glue.new()
+    glue.add_entries(
+        (f"Entry {i}", token_urlsafe(24), f"user{i}@example.com", f"https://site{i % 997}.com")
+        for i in range(entries)
+    )
+    path.write_bytes(glue.to_bytes())
+    glue.close()
+
+
+def measure(step: str, image: Path, vault: Path) -> None:
+    """Run one `step` and print its numbers as a tab-separated line."""
+    data = image.read_bytes() if step == "save" else None
+    session = cryptid.Session(vault, kdf.derive("bench", b"0" * 16, SPEC), SPEC, b"0" * 16)
+    rss_before = peak_rss()
+    tracemalloc.start()
+    start = perf_counter()
+    if step == "save":
+        session.save(data)
+    else:
+        _, data = cryptid.Session.unlock(vault, "bench")
+    elapsed = perf_counter() - start
+    _, traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = peak_rss()
+    rss = "" if rss_after is None else str(rss_after - rss_before)
+    print(step, f"{elapsed:.3f}", traced, rss, sep="\t")
+
+
+def main() -> None:
+    """Build a vault, then save and open it, each in a subprocess."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=200_000)
+    parser.add_argument("--step", choices=["save", "open"], help=argparse.SUPPRESS)
+    parser.add_argument("--image", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--vault", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.step:
+        measure(args.step, args.image, args.vault)
+        return
+
+    with TemporaryDirectory() as tmp:
+        image, vault = Path(tmp) / "image.db", Path(tmp) / "vault.lak"
+        make_image(image, args.entries)
+        size = image.stat().st_size
+        print(f"image: {size / 2**20:.1f} MiB, {args.entries} entries")
+        for step in ("save", "open"):
+            out = subprocess.run(
+                [sys.executable, "-m", "scripts.bench_cryptid", "--step", step]
+                + ["--image", str(image), "--vault", str(vault)],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout.split("\t")
+            _, elapsed, traced, rss = (part.strip() for part in out)
+            line = f"{step}: {float(elapsed):.3f} s, traced peak {int(traced) / 2**20:.1f} MiB"
+            line += f" ({int(traced) / size:.2f}x the image)"
+            if rss:
+                line += f", RSS peak +{int(rss) / 2**20:.1f} MiB"
+            print(line)
+        print(f"vault: {vault.stat().st_size / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,3 +7,7 @@ class IncorrectError(RuntimeError):
 
 class ExistsError(RuntimeError):
     """A value already exists."""
+
+
+class OutdatedError(RuntimeError):
+    """The app is too old for the supplied value."""
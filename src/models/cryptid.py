@@ -1,93 +1,611 @@
-"""The module providing database security."""
+"""The module providing database security.
 
-from base64 import b64decode, b64encode
-from os import urandom
+A vault file is laid out as:
+    `MAGIC` | version (1 byte) | header length (2 bytes, big-endian) | header | segments
+The header is JSON recording the KDF spec, the salt, the key check value, the codec the data
+was compressed with before encryption, the segment size, the nonce prefix, the key salt and,
+if secrets are sealed one by one inside the DB, the record key wrapped with a key of its own.
+
+The KDF output isn't used as is, HKDF splits it into the encryption key and the check value,
+and derives the wrapping key for the record key separately. Segments are sealed with a key
+derived from the encryption key and the key salt, which is random on every save, so nonces
+never repeat under one key however many times a session saves.
+Comparing the check value tells a wrong password right after key derivation, before any of
+the data is touched.
+
+The compressed data is split into segments of `segment` bytes (the last one may be shorter),
+each sealed with AES-GCM on its own, STREAM-style: the nonce is the prefix, the segment index
+and whether it's the last one, so segments can't be reordered, dropped or cut off unnoticed.
+Every segment authenticates the header, too. This way vaults are read and written a segment
+at a time, rather than encrypting or decrypting everything in one go.
+
+Saving never writes over the vault in place: a temporary file next to it is written, synced
+to disk and then renamed over it, so a crash mid-save leaves the previous vault intact.
+
+Vault files are mapped into memory rather than read, and segments are sliced out of the
+mapping and encrypted or decrypted into buffers allocated once, at their final size.
+
+Vaults from before the header, base64 of `salt | IV | tag | data` locked with PBKDF2, are
+still read, and get rewritten in the current format on the next save.
+"""
+
+from __future__ import annotations
+
+from base64 import b64decode
+from collections import deque
+from collections.abc import Buffer, Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+from hmac import compare_digest
+from itertools import chain
+from json import JSONDecodeError, dumps, loads
+from mmap import ACCESS_READ, mmap
+from os import O_RDONLY, chmod, close, cpu_count, fstat, fsync, replace, stat, urandom
+from os import open as os_open
 from pathlib import Path
+from stat import S_IMODE
+from struct import Struct
+from tempfile import NamedTemporaryFile
+from typing import Any, BinaryIO
 
 from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from zstandard import ZstdCompressor, ZstdDecompressor, ZstdError, frame_content_size
 
-from ..errors import IncorrectError
+from ..errors import IncorrectError, OutdatedError
+from . import kdf
 
 KDF_ITERATIONS = 600_000
 SALT_SIZE = 16
 IV_SIZE = 12
 TAG_SIZE = 16
-KEY_LENGTH = 32
+KEY_LENGTH = kdf.KEY_LENGTH
+# `update_into` wants room for a block more than the data, save for a byte.
+SLACK = algorithms.AES.block_size // 8 - 1
 
+MAGIC = b"\x89LAK"
+VERSION = 1
+PREAMBLE = Struct(">4sBH")
 
-def file_to_bytes(path: str | Path, password: str) -> bytes:
-    """Read a file at `path` and attempt decryption with `password`, decoding from base64.
+CODEC = "zstd"
+ZSTD_LEVEL = 3
 
-    Args:
-        path: The path to the file, in `str` or `pathlib.Path`
-        password: The password to the file, in `str`, key derived in-function
+CHECK_SIZE = 16
+SPLIT_INFO = b"Lock and Key vault keys"
+WRAP_INFO = b"Lock and Key record key wrap"
+SEGMENT_INFO = b"Lock and Key vault segments"
+
+SEGMENT_SIZE = 1 << 20
+# Nonce prefix, segment index and the last segment flag, adding up to a GCM nonce.
+SEGMENT_NONCE = Struct(">7sIB")
+NONCE_PREFIX_SIZE = 7
+
+# How many threads seal and open segments by default, the crypto backend releases the GIL.
+WORKERS = min(8, cpu_count() or 1)
+
+
+class Session:
+    """An unlocked vault file, keeping its derived key around so saving skips the KDF."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        path: str | Path,
+        key: bytes,
+        spec: dict[str, Any],
+        salt: bytes,
+        *,
+        workers: int | None = None,
+        record_key: bytes | None = None,
+    ):
+        """Bind a derived key to a vault file. Use `unlock` or `create` instead.
+
+        Args:
+            path: The path to the vault file, in `str` or `pathlib.Path`
+            key: The key derived from the password and `salt`
+            spec: The KDF spec the key was derived with, see `kdf`
+            salt: The salt the key was derived with
+            workers: How many threads to save with, `WORKERS` if not given
+            record_key: The key secrets in the DB are sealed with, if they are
+        """
+        self.path = Path(path)
+        self.spec = spec
+        self.workers = workers or WORKERS
+        self.record_key = record_key
+        self._key = key
+        self._salt = salt
+
+    @classmethod
+    def unlock(
+        cls, path: str | Path, password: str, workers: int | None = None
+    ) -> tuple[Session, bytearray]:
+        """Read a vault at `path` and decrypt it with `password`.
+
+        Args:
+            path: The path to the file, in `str` or `pathlib.Path`
+            password: The password to the file, in `str`, key derived in-function
+            workers: How many threads to decrypt with, `WORKERS` if not given
+
+        Returns:
+            The session for further saves and a `bytearray` containing the decrypted data.
+
+        Raises:
+            IncorrectError: The supplied password is wrong.
+            OutdatedError: The vault was made by a newer version of the app.
+            ValueError: The file is damaged or isn't a vault.
+        """
+        with Path(path).open("rb") as file, _mapped(file) as data:
+            if data[: len(MAGIC)] == MAGIC:
+                return cls._unlock(path, password, data, workers or WORKERS)
+            # `MAGIC` isn't valid base64, so anything else is from before the header.
+            decoded = memoryview(b64decode(data))
+
+        if len(decoded) < SALT_SIZE + IV_SIZE + TAG_SIZE:
+            raise ValueError("Not a Lock and Key vault")
+        spec = {"name": "pbkdf2", "iterations": KDF_ITERATIONS}
+        salt = bytes(decoded[:SALT_SIZE])
+        key = kdf.derive(password, salt, spec)
+        return cls(path, key, spec, salt, workers=workers), _open_whole(
+            key, decoded[SALT_SIZE:], b""
+        )
+
+    @classmethod
+    def _unlock(
+        cls, path: str | Path, password: str, data: memoryview, workers: int
+    ) -> tuple[Session, bytearray]:
+        header, aad = _read_header(data)
+        spec = header["kdf"]
+        salt = header["salt"]
+        master = kdf.derive(password, salt, spec)
+
+        key, check = _split(master)
+        if not compare_digest(check, header["check"]):
+            raise IncorrectError("Password is wrong")
+
+        key = _segment_key(key, header["keysalt"])
+        chunks = _ordered(
+            lambda sealed: _open_segment(key, header["nonce"], aad, sealed),
+            _read_segments(data[len(aad) :], header["segment"] + TAG_SIZE),
+            workers,
+        )
+        plain = _decompress(chunks)
+        record_key = _unwrap(master, header["records"]) if "records" in header else None
+        return cls(path, master, spec, salt, workers=workers, record_key=record_key), plain
+
+    @classmethod
+    def create(
+        cls,
+        path: str | Path,
+        password: str,
+        spec: dict[str, Any] | None = None,
+        workers: int | None = None,
+    ) -> Session:
+        """Derive a key for a new vault at `path`. Nothing is written until `save`.
+
+        Args:
+            path: The path to the result file, in `str` or `pathlib.Path`
+            password: The password to encrypt with, in `str`
+            spec: The KDF spec to derive the key with, `kdf.default()` if not given
+            workers: How many threads to save with, `WORKERS` if not given
+        """
+        spec = spec or kdf.default()
+        salt = urandom(SALT_SIZE)
+        return cls(path, kdf.derive(password, salt, spec), spec, salt, workers=workers)
+
+    def change_password(self, password: str, spec: dict[str, Any] | None = None) -> None:
+        """Derive a new key with a fresh salt. Takes effect on the next `save`.
+
+        Args:
+            password: The new password
+            spec: The KDF spec to switch to, the current one if not given
+        """
+        self.spec = spec or self.spec
+        self._salt = urandom(SALT_SIZE)
+        self._key = kdf.derive(password, self._salt, self.spec)
+
+    def enable_records(self) -> bytes:
+        """Make up a record key to seal secrets in the DB with, unless there's one already.
+
+        The key is stored in the vault header on `save`, see `Glue.seal_secrets`.
+
+        Returns:
+            The record key.
+        """
+        if self.record_key is None:
+            self.record_key = urandom(KEY_LENGTH)
+        return self.record_key
+
+    def save(self, data: Buffer) -> None:
+        """Compress and encrypt the `data` with the session key into the vault file.
+
+        The data is written a segment at a time, with a fresh key salt on every save.
+        Segments are sealed on `workers` threads, but always written in order.
+        The vault is only replaced once the new one is fully on disk, see `_replacing`.
+
+        Args:
+            data: The data to encrypt, in `bytes` or any other buffer
+        """
+        key, check = _split(self._key)
+        prefix = urandom(NONCE_PREFIX_SIZE)
+        salt = urandom(SALT_SIZE)
+        key = _segment_key(key, salt)
+        fields = {
+            "kdf": self.spec,
+            "salt": self._salt.hex(),
+            "check": check.hex(),
+            "codec": CODEC,
+            "segment": SEGMENT_SIZE,
+            "nonce": prefix.hex(),
+            "keysalt": salt.hex(),
+        }
+        if self.record_key is not None:
+            fields["records"] = _wrap(self._key, self.record_key).hex()
+        header = _pack(fields)
+        segments = enumerate(_resegment(_compress(data, self.workers), SEGMENT_SIZE))
+        with _replacing(self.path) as file:
+            file.write(header)
+            file.writelines(
+                _ordered(
+                    lambda piece: _seal_segment(key, prefix, header, piece),
+                    segments,
+                    self.workers,
+                )
+            )
+
+
+@contextmanager
+def _mapped(file: BinaryIO) -> Iterator[memoryview]:
+    """Map the whole `file` into memory for reading, instead of copying it in."""
+    if not fstat(file.fileno()).st_size:
+        yield memoryview(b"")
+        return
+    mapping = mmap(file.fileno(), 0, access=ACCESS_READ)
+    try:
+        with memoryview(mapping) as view:
+            yield view
+    finally:
+        # Slices of it may be still held by a traceback, the mapping goes once they're gone.
+        with suppress(BufferError):
+            mapping.close()
+
+
+@contextmanager
+def _replacing(path: Path) -> Iterator[BinaryIO]:
+    """Write a file that atomically replaces `path` once the block exits without errors.
+
+    The file is written next to `path`, so the rename stays on one filesystem, and synced
+    before and after the rename, so neither the data nor the rename can be lost in a crash.
+    Symlinks are followed, so a vault linked elsewhere, like into a synced folder, gets
+    replaced where it really is, rather than the link being replaced with a file.
+    """
+    path = path.resolve()
+    file = NamedTemporaryFile(  # noqa: SIM115
+        "wb", dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+    )
+    try:
+        with file:
+            yield file
+            file.flush()
+            fsync(file.fileno())
+        with suppress(FileNotFoundError):
+            chmod(file.name, S_IMODE(stat(path).st_mode))
+        replace(file.name, path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            Path(file.name).unlink()
+        raise
+    _sync_directory(path.parent)
+
+
+def _sync_directory(path: Path) -> None:
+    """Make renames in the directory at `path` durable, where directories can be synced."""
+    try:
+        fd = os_open(path, O_RDONLY)
+    except OSError:  # Windows can't open directories, and doesn't need to.
+        return
+    try:
+        with suppress(OSError):
+            fsync(fd)
+    finally:
+        close(fd)
+
+
+def _pack(header: dict[str, Any]) -> bytes:
+    """Serialize the `header` along with the magic, version and length preamble."""
+    raw = dumps(header, separators=(",", ":")).encode()
+    return PREAMBLE.pack(MAGIC, VERSION, len(raw)) + raw
+
+
+def _read_header(data: memoryview) -> tuple[dict[str, Any], bytes]:
+    """Read the preamble and header from the start of vault `data`.
 
     Returns:
-        A `bytes` object containing the decrypted data.
+        The parsed header and its raw bytes, preamble included.
 
     Raises:
-        IncorrectError: The supplied password is wrong.
+        OutdatedError: The vault was made by a newer version of the app.
+        ValueError: The header is damaged.
     """
-    data = b64decode(Path(path).read_bytes())
-
-    salt = data[:SALT_SIZE]
-    iv = data[SALT_SIZE : SALT_SIZE + IV_SIZE]
-    tag = data[SALT_SIZE + IV_SIZE : SALT_SIZE + IV_SIZE + TAG_SIZE]
-    ciphertext = data[SALT_SIZE + IV_SIZE + TAG_SIZE :]
-
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=KEY_LENGTH,
-        salt=salt,
-        iterations=KDF_ITERATIONS,
-        backend=default_backend(),
-    )
-    key = kdf.derive(password.encode())
+    if len(data) < PREAMBLE.size:
+        raise ValueError("Vault header is cut short")
+    _, version, length = PREAMBLE.unpack_from(data)
+    if version > VERSION:
+        raise OutdatedError(f"Vault format {version} is newer than {VERSION}, please update")
+    if version < VERSION:
+        raise ValueError(f"Unknown vault format {version}")
+    raw = bytes(data[: PREAMBLE.size + length])
+    try:
+        header = loads(raw[PREAMBLE.size :])
+        header["salt"] = bytes.fromhex(header["salt"])
+        if not isinstance(header["kdf"]["name"], str):
+            raise TypeError("KDF name is not a string")
+        if header["codec"] != CODEC:
+            raise ValueError(f"Unknown codec: {header['codec']}")
+        header["nonce"] = bytes.fromhex(header["nonce"])
+        if len(header["nonce"]) != NONCE_PREFIX_SIZE or header["segment"] <= 0:
+            raise ValueError("Bad segmentation")
+        header["check"] = bytes.fromhex(header["check"])
+        header["keysalt"] = bytes.fromhex(header["keysalt"])
+        if len(header["keysalt"]) != SALT_SIZE:
+            raise ValueError("Bad key salt")
+        if "records" in header:
+            header["records"] = bytes.fromhex(header["records"])
+    except (JSONDecodeError, UnicodeDecodeError, KeyError, TypeError, ValueError) as e:
+        raise ValueError("Vault header is damaged") from e
+    return header, raw
 
-    cipher = Cipher(algorithms.AES(key), modes.GCM(iv, tag), backend=default_backend())
-    decryptor = cipher.decryptor()
 
+def _split(master: bytes) -> tuple[bytes, bytes]:
+    """Derive the encryption key and the key check value from the KDF output."""
+    hkdf = HKDF(hashes.SHA256(), length=KEY_LENGTH + CHECK_SIZE, salt=None, info=SPLIT_INFO)
+    keys = hkdf.derive(master)
+    return keys[:KEY_LENGTH], keys[KEY_LENGTH:]
+
+
+def _segment_key(key: bytes, salt: bytes) -> bytes:
+    """Derive the key segments of one save are sealed with from the encryption key."""
+    return HKDF(hashes.SHA256(), length=KEY_LENGTH, salt=salt, info=SEGMENT_INFO).derive(key)
+
+
+def _wrap(master: bytes, record_key: bytes) -> bytes:
+    """Seal the `record_key` with a key derived from the KDF output."""
+    nonce = urandom(IV_SIZE)
+    return nonce + AESGCM(_wrapping_key(master)).encrypt(nonce, record_key, None)
+
+
+def _unwrap(master: bytes, wrapped: bytes) -> bytes:
+    """Undo `_wrap`.
+
+    Raises:
+        ValueError: The wrapped key is damaged.
+    """
     try:
-        return decryptor.update(ciphertext) + decryptor.finalize()
+        return AESGCM(_wrapping_key(master)).decrypt(wrapped[:IV_SIZE], wrapped[IV_SIZE:], None)
     except InvalidTag as e:
+        raise ValueError("Vault record key is damaged") from e
+
+
+def _wrapping_key(master: bytes) -> bytes:
+    return HKDF(hashes.SHA256(), length=KEY_LENGTH, salt=None, info=WRAP_INFO).derive(master)
+
+
+def _decrypt(key: bytes, nonce: bytes, tag: bytes, data: Buffer, aad: bytes) -> bytearray:
+    """Decrypt `data` with AES-GCM right into a buffer of its size.
+
+    Raises:
+        InvalidTag: The key is wrong or the data is damaged.
+    """
+    cipher = Cipher(algorithms.AES(key), modes.GCM(nonce, tag), backend=default_backend())
+    decryptor = cipher.decryptor()
+    decryptor.authenticate_additional_data(aad)
+    plain = bytearray(len(memoryview(data)) + SLACK)
+    size = decryptor.update_into(data, plain)
+    decryptor.finalize()
+    del plain[size:]
+    return plain
+
+
+def _open_whole(key: bytes, body: memoryview, aad: bytes) -> bytearray:
+    """Decrypt `IV | tag | data`, the way vaults were sealed before the header.
+
+    Raises:
+        IncorrectError: The key is wrong.
+    """
+    iv = bytes(body[:IV_SIZE])
+    tag = bytes(body[IV_SIZE : IV_SIZE + TAG_SIZE])
+    try:
+        return _decrypt(key, iv, tag, body[IV_SIZE + TAG_SIZE :], aad)
+    except (InvalidTag, ValueError) as e:
         raise IncorrectError("Password is wrong") from e
 
 
-def bytes_to_file(path: str | Path, password: str, data: bytes) -> None:
-    """Encrypt the `data` with `password` and store base64-encoded result in file at `path`.
+def _resegment(chunks: Iterable[Buffer], size: int) -> Iterator[tuple[Buffer, bool]]:
+    """Regroup `chunks` into pieces of `size` bytes, telling whether each is the last one.
+
+    Whole pieces are sliced out of the chunks as they are, the rest is gathered into buffers.
+    The last piece is never empty, unless there's no data at all.
+    """
+    held: Buffer | None = None  # A whole piece, waiting to see if anything follows it.
+    pending, filled = bytearray(size), 0
+    for chunk in chunks:
+        view = memoryview(chunk)
+        while view:
+            if held is not None:
+                yield held, False
+                held = None
+            if not filled and len(view) >= size:
+                held, view = view[:size], view[size:]
+                continue
+            taken = min(size - filled, len(view))
+            pending[filled : filled + taken] = view[:taken]
+            filled += taken
+            view = view[taken:]
+            if filled == size:
+                held, pending, filled = pending, bytearray(size), 0
+    if held is not None:
+        yield held, True
+    else:
+        yield memoryview(pending)[:filled], True
+
+
+def _seal_segment(
+    key: bytes, prefix: bytes, aad: bytes, piece: tuple[int, tuple[Buffer, bool]]
+) -> bytearray:
+    """Encrypt a segment from `_resegment` into a buffer holding it along with its tag."""
+    index, (segment, last) = piece
+    nonce = SEGMENT_NONCE.pack(prefix, index, last)
+    cipher = Cipher(algorithms.AES(key), modes.GCM(nonce), backend=default_backend())
+    encryptor = cipher.encryptor()
+    encryptor.authenticate_additional_data(aad)
+    # The room for the tag doubles as the slack `update_into` wants.
+    sealed = bytearray(len(memoryview(segment)) + TAG_SIZE)
+    size = encryptor.update_into(segment, sealed)
+    encryptor.finalize()
+    sealed[size:] = encryptor.tag
+    return sealed
+
+
+def _read_segments(body: memoryview, size: int) -> Iterator[tuple[int, memoryview, bool]]:
+    """Slice sealed segments of `size` bytes out of `body`, telling whether each is the last."""
+    count = max(1, -(-len(body) // size))
+    for index in range(count):
+        yield index, body[index * size : (index + 1) * size], index == count - 1
+
+
+def _open_segment(
+    key: bytes, prefix: bytes, aad: bytes, sealed: tuple[int, memoryview, bool]
+) -> bytearray:
+    """Decrypt a segment sliced by `_read_segments`.
+
+    Raises:
+        ValueError: The segment is damaged, out of order or the vault is cut short.
+    """
+    index, chunk, last = sealed
+    if len(chunk) < TAG_SIZE:
+        raise ValueError(f"Vault segment {index} is cut short")
+    tag = bytes(chunk[-TAG_SIZE:])
+    try:
+        return _decrypt(key, SEGMENT_NONCE.pack(prefix, index, last), tag, chunk[:-TAG_SIZE], aad)
+    except InvalidTag as e:
+        raise ValueError(f"Vault segment {index} is damaged") from e
+
+
+def _ordered[T, R](fn: Callable[[T], R], items: Iterable[T], workers: int) -> Iterator[R]:
+    """Like `map`, but calling `fn` on up to `workers` threads.
+
+    Results come in the order of `items`. Only a couple of items per worker are in flight
+    at once, so memory stays bounded however many there are.
+    """
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    with ThreadPoolExecutor(workers, thread_name_prefix="cryptid") as pool:
+        pending: deque[Future[R]] = deque()
+        try:
+            for item in items:
+                pending.append(pool.submit(fn, item))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _compress(data: Buffer, workers: int = 1) -> Iterator[Buffer]:
+    """Compress the `data` a `SEGMENT_SIZE` worth of input at a time, on `workers` threads."""
+    view = memoryview(data)
+    threads = workers if workers > 1 else 0
+    compressor = ZstdCompressor(level=ZSTD_LEVEL, threads=threads).compressobj(size=len(view))
+    for start in range(0, len(view), SEGMENT_SIZE):
+        yield compressor.compress(view[start : start + SEGMENT_SIZE])
+    yield compressor.flush()
+
+
+class _Chunks:
+    """A file-like reader over `chunks`, handing out a whole chunk per read."""
+
+    def __init__(self, chunks: Iterator[Buffer]):
+        self._chunks = chunks
+
+    def read(self, _size: int = -1) -> Buffer:
+        return next(self._chunks, b"")
+
+
+def _decompress(chunks: Iterable[Buffer]) -> bytearray:
+    """Undo `_compress`, consuming `chunks` as they come.
+
+    When the size is known upfront, the data is decompressed right into the resulting buffer.
+
+    Raises:
+        ValueError: The data is damaged.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, b"")
+    try:
+        size = frame_content_size(first)
+    except ZstdError as e:
+        raise ValueError("Vault data is damaged") from e
+    try:
+        if size < 0:
+            decompressor = ZstdDecompressor().decompressobj()
+            return _collect(decompressor.decompress(chunk) for chunk in chain([first], chunks))
+        return _fill(ZstdDecompressor().stream_reader(_Chunks(chain([first], chunks))), size)
+    except ZstdError as e:
+        raise ValueError("Vault data is damaged") from e
+
+
+def _fill(reader: Any, size: int) -> bytearray:
+    """Read exactly `size` bytes from `reader` into a buffer of that size.
+
+    Raises:
+        ValueError: The reader ran out early.
+    """
+    data = bytearray(size)
+    with memoryview(data) as view:
+        filled = 0
+        while filled < size:
+            read = reader.readinto(view[filled:])
+            if not read:
+                raise ValueError("Vault data is cut short")
+            filled += read
+    return data
+
+
+def _collect(chunks: Iterable[Buffer]) -> bytearray:
+    """Join `chunks` as they come, dropping each one once it's copied."""
+    data = bytearray()
+    for chunk in chunks:
+        data += chunk
+    return data
+
+
+def file_to_bytes(path: str | Path, password: str) -> bytearray:
+    """Read a vault at `path` and attempt decryption with `password`.
 
     Args:
-        path: The path to the result file, in `str` or `pathlib.Path`
-        password: The password to encrypt with, in `str`, derived in-function
-        data: The data in `bytes` to encrypt
+        path: The path to the file, in `str` or `pathlib.Path`
+        password: The password to the file, in `str`, key derived in-function
 
     Returns:
-        Nothing.
+        A `bytearray` containing the decrypted data.
 
     Raises:
-        ...
+        IncorrectError: The supplied password is wrong.
     """
-    salt = urandom(SALT_SIZE)
-    iv = urandom(IV_SIZE)
-
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=KEY_LENGTH,
-        salt=salt,
-        iterations=KDF_ITERATIONS,
-        backend=default_backend(),
-    )
-    key = kdf.derive(password.encode())
+    return Session.unlock(path, password)[1]
 
-    cipher = Cipher(algorithms.AES(key), modes.GCM(iv), backend=default_backend())
-    encryptor = cipher.encryptor()
-    ciphertext = encryptor.update(data) + encryptor.finalize()
 
-    tag = encryptor.tag
-    packed = salt + iv + tag + ciphertext
-    b64_data = b64encode(packed)
-    Path(path).write_bytes(b64_data)
+def bytes_to_file(path: str | Path, password: str, data: Buffer) -> None:
+    """Encrypt the `data` with `password` and store the result in a vault at `path`.
+
+    Args:
+        path: The path to the result file, in `str` or `pathlib.Path`
+        password: The password to encrypt with, in `str`, derived in-function
+        data: The data to encrypt, in `bytes` or any other buffer
+    """
+    Session.create(path, password).save(data)
@@ -7,8 +7,8 @@ from .db import Glue
 
 
 def dump_to_file(glue: Glue, file: str | Path) -> None:
-    """Dumps DB data of `glue` to `file`."""
-    with glue.querying(row=True) as sql:
+    """Dumps DB data of `glue` to `file`, with sealed secrets opened."""
+    with glue.querying(row=True, readonly=True) as sql:
         entries = sql.query(
             """
             SELECT *
@@ -23,6 +23,8 @@ def dump_to_file(glue: Glue, file: str | Path) -> None:
             """,
             fetch=0,
         )
+    for entry in entries:
+        entry["secret"] = glue.unseal(entry["secret"])
     with Path(file).open("w", encoding="utf-8") as output:
         if entries:
             output.write("# Entries:\n")
@@ -73,4 +75,6 @@ def restore_from_file(glue: Glue, file: str | Path) -> None:
                     VALUES ({", ".join(["?"] * len(values))})
                     """  # noqa: S608
                     sql.query(query, tuple(values), fetch=-1)
-    glue.dirty = True
+    if glue.sealed:
+        glue.seal_secrets()
+    glue.touch()
@@ -2,49 +2,77 @@
 
 from __future__ import annotations
 
+from collections.abc import Buffer, Callable, Iterable, Iterator, Sequence
 from contextlib import AbstractContextManager
+from functools import cached_property
 from pathlib import Path
-from sqlite3 import Connection, Cursor, Row, connect
+from re import findall
+from sqlite3 import Connection, Cursor, DatabaseError, OperationalError, Row
+from threading import Lock
+from time import perf_counter
 from typing import Any
+from uuid import uuid4
 
-from .migrant import init
+from ..errors import IncorrectError
+from .domains import host_of, site_of, website_records
+from .fuzzy import TrigramIndex
+from .migrant import init, upgrade_or_stall
+from .pool import ConnectionPool
+from .sealing import Sealer
+from .stats import QueryStats
+
+# Kinds of entry changes reported to `Glue.on_entries`. A reset means anything may've changed.
+INSERTED = "inserted"
+UPDATED = "updated"
+DELETED = "deleted"
+RESET = "reset"
+
+# How many IDs to look up per query, well under SQLite's limit on parameters.
+ID_CHUNK = 500
 
 
 class Glue:
     """A class for atomizing DB queries."""
 
-    _SHARED_URL = "file::memory:?cache=shared"
-
     class QueryContext(AbstractContextManager):
         """Manages a somewhat safe context for performing queries."""
 
-        def __init__(self, uri: str, timeout: int = 10, row: bool = True):
+        def __init__(
+            self,
+            pool: ConnectionPool,
+            row: bool = True,
+            readonly: bool = False,
+            stats: QueryStats | None = None,
+        ):
             """Manages a somewhat safe context for performing queries.
 
             Args:
-                uri: The `str` URI to the database
-                timeout: Timeout (in seconds) of query completion
+                pool: The `ConnectionPool` to borrow a connection from
                 row: Whether to use `sqlite3.Row` factory for cursors
+                readonly: Whether a reader connection is enough for the queries
+                stats: Where to record query timings, if anywhere
             """
-            self.uri = uri
-            self.timeout = timeout
+            self.pool = pool
             self.row = row
+            self.readonly = readonly
+            self.stats = stats
             self.conn: Connection
             self.cursor: Cursor
 
         def __enter__(self):  # noqa: D105
-            self.conn = connect(self.uri, uri=True, timeout=self.timeout)
-            if self.row:
-                self.conn.row_factory = Row
-            self.cursor = self.conn.cursor()
+            self._borrow(self.pool.reading() if self.readonly else self.pool.writing())
             return self
 
+        def _borrow(self, borrowed: AbstractContextManager[Connection]) -> None:
+            self._borrowed = borrowed
+            self.conn = borrowed.__enter__()
+            self.cursor = self.conn.cursor()
+            if self.row:
+                self.cursor.row_factory = Row
+
         def __exit__(self, exc_type, exc_value, traceback):  # noqa: D105
-            if exc_type is None:
-                self.conn.commit()
-            else:
-                self.conn.rollback()
-            self.conn.close()
+            self.cursor.close()
+            return self._borrowed.__exit__(exc_type, exc_value, traceback)
 
         def query(self, sql: str, params: tuple | dict = (), fetch: int = 1) -> Any:
             # This method is shamelessly stolen from my other project Chancery.
@@ -64,6 +92,35 @@ class Glue:
                 The first row if ``fetch`` is 1.
                 A list or rows if ``fetch`` is 0 or >1.
             """
+            if self.stats is None:
+                return self._query(sql, params, fetch)
+            start = perf_counter()
+            result = self._query(sql, params, fetch)
+            elapsed = perf_counter() - start
+            if fetch == 1:
+                fetched = int(result is not None)
+            elif fetch <= -1:
+                fetched = 0
+            else:
+                fetched = len(result)
+            self.stats.record(sql, elapsed, max(fetched, self.cursor.rowcount))
+            return result
+
+        def _query(self, sql: str, params: tuple | dict, fetch: int) -> Any:
+            try:
+                return self._run(sql, params, fetch)
+            except OperationalError as e:
+                if not self.readonly or self.conn is self.pool.writer or "locked" not in str(e):
+                    raise
+            # In-memory DBs share a cache, where the writer locks the tables it wrote to until
+            # it commits, and reads bump into such locks at once rather than waiting them out.
+            # So the reads move over to the writer, which waits for the commit.
+            self.cursor.close()
+            self._borrowed.__exit__(None, None, None)
+            self._borrow(self.pool.writing())
+            return self._run(sql, params, fetch)
+
+        def _run(self, sql: str, params: tuple | dict, fetch: int) -> Any:
             fetch = max(fetch, -1)
             self.cursor.execute(sql, params)
             match fetch:
@@ -78,29 +135,133 @@ class Glue:
                     result = self.cursor.fetchmany(size=fetch)
             return result if not self.row else tuple(map(dict, result))
 
-    def __init__(self, uri: str = _SHARED_URL):
-        """Spawns the DB Glue."""
+        def query_many(self, sql: str, params: Iterable[tuple | dict]) -> int:
+            """Performs an SQL query once per parameter set, in the current transaction.
+
+            Args:
+                sql (str): The query to run
+                params (Iterable[tuple | dict]): Parameter sets to pass, one per execution
+
+            Returns:
+                The total amount of rows modified.
+            """
+            start = perf_counter()
+            self.cursor.executemany(sql, params)
+            if self.stats is not None:
+                self.stats.record(sql, perf_counter() - start, self.cursor.rowcount)
+            return self.cursor.rowcount
+
+    def __init__(self, uri: str | None = None, readers: int = 2):
+        """Spawns the DB Glue.
+
+        Args:
+            uri: The `str` URI to the database. If not given, a fresh in-memory DB is made,
+                shared by this Glue's connections only
+            readers: How many reader connections the pool may keep open
+        """
+        if uri is None:
+            uri = f"file:vault-{uuid4().hex}?mode=memory&cache=shared"
         self.uri: str = uri
-        self._conn: Connection
-        self.dirty: bool = False
+        self.pool = ConnectionPool(uri, readers=readers)
+        self.revision: int = 0
+        self._saved: int = 0
+        self._stats: QueryStats | None = None
+        self._sealer: Sealer | None = None
+        # Called with the new revision on every change, on the thread that made it.
+        self.on_change: Callable[[int], None] | None = None
+        # Called with the kind of change and the IDs of affected entries, see `touch`.
+        self.on_entries: Callable[[str, tuple[int, ...]], None] | None = None
+        self._fuzzy: TrigramIndex | None = None
+        # Changes made while the fuzzy index is being built, to catch up on once it is.
+        self._fuzzy_pending: list[tuple[str, tuple[int, ...]]] | None = None
+        self._fuzzy_lock = Lock()
+        self._fuzzy_build_lock = Lock()
+
+    @property
+    def dirty(self) -> bool:
+        """Whether the DB changed since it was last saved. Setting it bumps or saves `revision`.
+
+        Bumping it notifies `on_change`, so savers can follow changes without polling.
+        """
+        return self.revision != self._saved
+
+    @dirty.setter
+    def dirty(self, value: bool) -> None:
+        if value:
+            self.revision += 1
+            if self.on_change is not None:
+                self.on_change(self.revision)
+        else:
+            self._saved = self.revision
 
-    def querying(self, timeout: int = 10, row: bool = False) -> QueryContext:
-        """Creates a query context for you. Neat!"""
-        return self.QueryContext(uri=self.uri, timeout=timeout, row=row)
+    def touch(
+        self, kind: str = RESET, identifiers: Iterable[int] = (), *, texts: bool = True
+    ) -> None:
+        """Mark the DB dirty, and report to `on_entries` what happened to which entries.
+
+        The websites table and the fuzzy index, if built, are brought up to date as well,
+        see `entries_for_url` and `find`.
+
+        Args:
+            kind: `INSERTED`, `UPDATED`, `DELETED`, or `RESET` if it's unclear what changed
+            identifiers: The IDs of the entries changed, `INSERTED` ones in ascending order
+            texts: Whether names, logins or websites may've changed
+        """
+        identifiers = tuple(identifiers)
+        self.dirty = True
+        if texts:
+            self._index_websites(kind, identifiers)
+            self._reindex(kind, identifiers)
+        if self.on_entries is not None:
+            self.on_entries(kind, identifiers)
+
+    def mark_saved(self, revision: int) -> None:
+        """Record that the DB as of `revision` got saved. Changes made after it stay dirty."""
+        self._saved = max(self._saved, revision)
+
+    def querying(self, row: bool = False, readonly: bool = False) -> QueryContext:
+        """Creates a query context for you on a pooled connection. Neat!
+
+        Args:
+            row: Whether to return rows as `dict`s
+            readonly: Whether the context only reads, so a reader connection can be borrowed
+        """
+        return self.QueryContext(self.pool, row=row, readonly=readonly, stats=self._stats)
+
+    def instrument(self, slow_ms: float = 50.0) -> QueryStats:
+        """Start timing every query, logging ones slower than `slow_ms` milliseconds."""
+        self._stats = QueryStats(slow_ms)
+        return self._stats
+
+    def stats(self) -> dict[str, Any]:
+        """Get query timings collected since `instrument`, see `QueryStats.snapshot`.
+
+        Returns an empty `dict` if the Glue isn't instrumented.
+        """
+        return self._stats.snapshot() if self._stats is not None else {}
 
     @classmethod
-    def from_bytes(cls, data: bytes) -> Glue:
+    def from_bytes(cls, data: Buffer) -> Glue:
         """Spawn the DB Glue on top of a decrypted in-memory database.
 
+        The data is deserialized straight into the writer connection. Such an image is private
+        to the connection it lives in, so the Glue doesn't get any reader connections.
+
         Args:
-            data: The `bytes` object containing the unencrypted serialized data.
+            data: The unencrypted serialized data, in `bytes` or any other buffer.
+
+        Raises:
+            IncorrectError: The data isn't a Lock and Key database.
+            OutdatedError: The database was made by a newer version of the app.
         """
-        instance = cls()
-        tmp = connect(":memory:", uri=True)
-        tmp.deserialize(data)
-        conn = connect("file::memory:?cache=shared", uri=True)
-        tmp.backup(conn)
-        instance._conn = conn
+        instance = cls(":memory:", readers=0)
+        try:
+            with instance.pool.writing() as conn:
+                conn.deserialize(data)
+        except DatabaseError as e:
+            instance.close()
+            raise IncorrectError("Not a Lock and Key database") from e
+        instance._upgrade()
         return instance
 
     @classmethod
@@ -109,28 +270,44 @@ class Glue:
 
         Args:
             uri: The file path or in-memory mapping to the database.
+
+        Raises:
+            IncorrectError: The file isn't a Lock and Key database.
+            OutdatedError: The database was made by a newer version of the app.
         """
         instance = cls(str(uri))
-        instance._conn = connect(uri, uri=True)
+        instance._upgrade()
         return instance
 
     @classmethod
     def new(cls) -> Glue:
         """Initialize the database and spawn the DB Glue on top of it."""
         instance = cls()
-        instance._conn = connect("file::memory:?cache=shared", uri=True)
-        init(instance._conn)
+        with instance.pool.writing() as conn:
+            init(conn)
         return instance
 
+    def _upgrade(self) -> None:
+        """Bring the freshly opened DB up to date, closing it if that's impossible."""
+        try:
+            with self.pool.writing() as conn:
+                self.dirty = upgrade_or_stall(conn)
+        except Exception:
+            self.close()
+            raise
+
     def to_bytes(self) -> bytes:
-        """Serialize the database into a `bytes` object."""
-        dest = connect(":memory:")
-        self._conn.backup(dest)
-        return dest.serialize()
+        """Serialize the database into a `bytes` object, straight from the writer connection."""
+        with self.pool.writing() as conn:
+            return conn.serialize()
 
-    def query(self, query: str, params: tuple | dict = (), fetch: int = 1) -> Any:
+    def query(
+        self, query: str, params: tuple | dict = (), fetch: int = 1, readonly: bool = False
+    ) -> Any:
         # This method is shamelessly stolen from my other project Chancery.
-        """Performs a synchronous query. Note: Consider using ``QueryContext`` instead.
+        """Performs a synchronous query on a pooled connection.
+
+        Note: Consider using ``QueryContext`` for several queries in one transaction.
 
         Args:
             query (str): The SQL query
@@ -140,38 +317,43 @@ class Glue:
                     If 0, returns a list of all.
                     If 1, returns the first row.
                     If >1, returns a list of that many rows or all, whatever is less
+            readonly (bool): Whether the query only reads
 
         Returns:
             Any: All results of the query.
         """
-        fetch = max(fetch, -1)
-        conn = connect(self.uri, uri=True)
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        match fetch:
-            case -1:
-                result = None
-            case 0:
-                result = cursor.fetchall()
-            case 1:
-                result = cursor.fetchone()
-            case _:
-                result = cursor.fetchmany(size=fetch)
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return result
+        with self.querying(readonly=readonly) as sql:
+            return sql.query(query, params, fetch)
 
     def close(self) -> None:
-        """Close up the in-memory connection, letting the GC clear it.
+        """Close up the pooled connections, letting the GC clear the in-memory DB.
 
         Changes aren't automatically saved to disk!
         """
-        self._conn.close()
+        if self._stats is not None:
+            self._stats.report()
+        if self._sealer is not None:
+            self._sealer.clear()
+        self._fuzzy = None
+        self.pool.close()
+
+    @cached_property
+    def searchable(self) -> bool:
+        """Whether the DB has a full-text index over entries."""
+        return bool(
+            self.query(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'secrets_fts'",
+                readonly=True,
+            )
+        )
 
     def entries(self, *, text: str | None = None, group: int | None = None) -> tuple[tuple]:
         """Return a tuple of entry tuples, filtered by `group` id if given.
 
+        With a full-text index, every word of `text` is a prefix to look for
+        in name, login or website, and the best matches go first. Without one,
+        `text` is a `*`/`?` wildcard pattern matched against the name.
+
         Args:
             text: The text query to filter for, `str`
             group: The group id to filter for, `int`.
@@ -182,29 +364,288 @@ class Glue:
                 `secretId` `secret(name)`
                 `secret` `login`
                 `website` `lastAccess`
-            In this exact order.
+            In this exact order. Sealed secrets are left as they are, see `secret`.
+        """
+        with self.querying(readonly=True) as sql:
+            return sql.query(*self._listing(text, group), fetch=0)
+
+    def entries_page(
+        self,
+        after_id: int = 0,
+        limit: int = 500,
+        *,
+        text: str | None = None,
+        group: int | None = None,
+    ) -> list[tuple]:
+        """Return up to `limit` entries with IDs greater than `after_id`, ordered by ID.
+
+        Pass the ID of the last entry of a page as `after_id` to get the next one.
+
+        Args:
+            after_id: The ID to continue after, `int`. 0 to start from the beginning
+            limit: How many entries to return at most, `int`
+            text: The text query to filter for, `str`
+            group: The group id to filter for, `int`.
+
+        Returns:
+            A list of tuples, same as `entries` has.
+        """
+        with self.querying(readonly=True) as sql:
+            return sql.query(*self._listing(text, group, after_id, limit), fetch=0)
+
+    def iter_entries(
+        self, *, text: str | None = None, group: int | None = None, page: int = 500
+    ) -> Iterator[tuple]:
+        """Lazily yield entries ordered by ID, holding at most `page` of them at a time.
+
+        Args:
+            text: The text query to filter for, `str`
+            group: The group id to filter for, `int`.
+            page: How many entries to fetch per query, `int`
+
+        Yields:
+            Tuples, same as `entries` has.
+        """
+        after = 0
+        while True:
+            rows = self.entries_page(after, page, text=text, group=group)
+            yield from rows
+            if len(rows) < page:
+                return
+            after = rows[-1][2]
+
+    def entries_by_ids(
+        self,
+        identifiers: Iterable[int],
+        *,
+        text: str | None = None,
+        group: int | None = None,
+    ) -> list[tuple]:
+        """Return the entries under `identifiers` that match `text` and `group`, in no order.
+
+        Args:
+            identifiers: The IDs of the entries to look up
+            text: The text query to filter for, `str`
+            group: The group id to filter for, `int`.
+
+        Returns:
+            A list of tuples, same as `entries` has.
+        """
+        identifiers = list(identifiers)
+        rows: list[tuple] = []
+        with self.querying(readonly=True) as sql:
+            for start in range(0, len(identifiers), ID_CHUNK):
+                chunk = identifiers[start : start + ID_CHUNK]
+                rows.extend(sql.query(*self._listing(text, group, ids=chunk), fetch=0))
+        return rows
+
+    def entries_for_url(self, url: str) -> list[tuple]:
+        """Return entries for the site `url` is on, the closest matches first.
+
+        Websites are matched by registrable domain, so "https://accounts.google.com/signin"
+        finds entries for "google.com" and "mail.google.com" alike. Entries for the very same
+        host go first, then ones for the domains it's under, then the rest of the site.
+        It's an index lookup, no matter how many entries there are.
+
+        Args:
+            url: The URL or bare host to look for, `str`
+
+        Returns:
+            A list of tuples, same as `entries` has.
+        """
+        host = host_of(url)
+        if host is None:
+            return []
+        with self.querying(readonly=True) as sql:
+            rows = sql.query(
+                """
+                SELECT
+                    w.host, g.iconId, g.name, e.secretId, e.name,
+                    e.secret, e.login, e.website, e.lastAccess
+                FROM
+                    websites w
+                JOIN secrets e USING(secretId)
+                LEFT JOIN groups g USING(groupId)
+                WHERE w.site = ?
+                ORDER BY e.secretId
+                """,
+                (site_of(host),),
+                fetch=0,
+            )
+        rows.sort(key=lambda row: _closeness(host, row[0]))
+        return [row[1:] for row in rows]
+
+    def _index_websites(self, kind: str, identifiers: tuple[int, ...]) -> None:
+        """Bring the websites table up to date with a change, see `touch`.
+
+        Its rows are only written here, while triggers drop the ones of deleted entries and
+        changed websites, so entries changed by other apps go missing from it, not stale.
         """
+        if kind == DELETED:
+            return
         with self.querying() as sql:
-            query = """
-            SELECT
-                g.iconId, g.name, e.secretId, e.name,
-                e.secret, e.login, e.website, e.lastAccess
-            FROM
-                secrets e
-            LEFT JOIN groups g USING(groupId)
+            if kind == RESET:
+                sql.query("DELETE FROM websites", fetch=-1)
+                rows = sql.query(
+                    "SELECT secretId, website FROM secrets WHERE website IS NOT NULL", fetch=0
+                )
+            else:
+                rows = []
+                for start in range(0, len(identifiers), ID_CHUNK):
+                    chunk = identifiers[start : start + ID_CHUNK]
+                    marks = ", ".join("?" * len(chunk))
+                    sql.query(f"DELETE FROM websites WHERE secretId IN ({marks})", chunk, fetch=-1)  # noqa: S608
+                    rows += sql.query(
+                        f"SELECT secretId, website FROM secrets WHERE secretId IN ({marks})",  # noqa: S608
+                        chunk,
+                        fetch=0,
+                    )
+            sql.query_many(
+                "INSERT INTO websites(secretId, host, site) VALUES (?, ?, ?)",
+                website_records(rows),
+            )
 
-            """
-            criteria = []
-            params = []
-            if group:
-                criteria.append("e.groupId = ?")
-                params.append(group)
-            if text:
-                criteria.append("lower(e.name) LIKE ?")
-                params.append(text.replace("*", "%").replace("?", "_"))
-            if criteria:
-                query += "WHERE " + " AND ".join(criteria)
-            return sql.query(query, tuple(params), fetch=0)
+    def fuzzy_index(self) -> TrigramIndex:
+        """The trigram index over names, logins and websites behind `find`, built on first use.
+
+        It's kept up to date on every change from then on, so it's built once per Glue unless
+        the DB gets replaced as a whole, like on a CSV restore. Building takes a while on big
+        vaults, so it's best done on a worker: the DB is only held while the entries are read,
+        and changes made meanwhile are caught up on once it's built.
+        """
+        with self._fuzzy_build_lock:
+            while True:
+                with self._fuzzy_lock:
+                    if self._fuzzy is not None:
+                        return self._fuzzy
+                    self._fuzzy_pending = []
+                with self.querying(readonly=True) as sql:
+                    rows = sql.query("SELECT secretId, name, login, website FROM secrets", fetch=0)
+                index = TrigramIndex()
+                index.add_many(rows)
+                del rows
+                with self._fuzzy_lock:
+                    pending, self._fuzzy_pending = self._fuzzy_pending, None
+                    if any(kind == RESET for kind, _ in pending):
+                        continue
+                    for kind, identifiers in pending:
+                        self._update_index(index, kind, identifiers)
+                    self._fuzzy = index
+                    return index
+
+    @property
+    def fuzzy_ready(self) -> bool:
+        """Whether the fuzzy index is built, so `find` won't have to wait for it."""
+        return self._fuzzy is not None
+
+    def find(self, text: str, *, group: int | None = None, limit: int = 200) -> list[tuple]:
+        """Return entries roughly matching `text` in name, login or website, the best first.
+
+        Unlike `entries`, this tolerates typos: "gthub" finds "GitHub". See `TrigramIndex`.
+
+        Args:
+            text: What to look for, `str`
+            group: The group id to filter for, `int`.
+            limit: How many entries to return at most, `int`
+
+        Returns:
+            A list of tuples, same as `entries` has.
+        """
+        ranked = self.fuzzy_index().search(text, None if group else limit)
+        rows: list[tuple] = []
+        # Matches out of the group get filtered out, so the ranking is gone through in chunks.
+        for start in range(0, len(ranked), ID_CHUNK):
+            chunk = ranked[start : start + ID_CHUNK]
+            found = {row[2]: row for row in self.entries_by_ids(chunk, group=group)}
+            rows.extend(found[identifier] for identifier in chunk if identifier in found)
+            if len(rows) >= limit:
+                break
+        return rows[:limit]
+
+    def _reindex(self, kind: str, identifiers: tuple[int, ...]) -> None:
+        """Bring the fuzzy index, if built, up to date with a change, see `touch`."""
+        with self._fuzzy_lock:
+            if self._fuzzy_pending is not None:
+                # It's being built, so the change is caught up on once it is.
+                self._fuzzy_pending.append((kind, identifiers))
+            if self._fuzzy is None:
+                return
+            if kind == RESET:
+                self._fuzzy = None
+                return
+            self._update_index(self._fuzzy, kind, identifiers)
+
+    def _update_index(self, index: TrigramIndex, kind: str, identifiers: tuple[int, ...]) -> None:
+        """Re-read the entries under `identifiers` into `index`, or drop them if `DELETED`."""
+        if kind == DELETED:
+            for identifier in identifiers:
+                index.remove(identifier)
+            return
+        with self.querying(readonly=True) as sql:
+            for start in range(0, len(identifiers), ID_CHUNK):
+                chunk = identifiers[start : start + ID_CHUNK]
+                rows = sql.query(
+                    f"""
+                    SELECT secretId, name, login, website
+                    FROM secrets
+                    WHERE secretId IN ({", ".join("?" * len(chunk))})
+                    """,  # noqa: S608
+                    chunk,
+                    fetch=0,
+                )
+                index.add_many(rows)
+                for identifier in set(chunk).difference(row[0] for row in rows):
+                    index.remove(identifier)
+
+    def _listing(
+        self,
+        text: str | None,
+        group: int | None,
+        after: int | None = None,
+        limit: int | None = None,
+        *,
+        ids: Sequence[int] | None = None,
+    ) -> tuple[str, tuple]:
+        """Build the query and parameters behind `entries`, `entries_page` and `entries_by_ids`.
+
+        Pages (when `after` is given) are ordered by ID, plain listings by relevance.
+        """
+        source = "secrets e"
+        key = "e.secretId"
+        criteria = []
+        params: list[Any] = []
+        order = ""
+        if group:
+            criteria.append("e.groupId = ?")
+            params.append(group)
+        if text and self.searchable and (match := _match_expression(text)):
+            source = "secrets_fts f JOIN secrets e ON e.secretId = f.rowid"
+            key = "f.rowid"
+            criteria.append("secrets_fts MATCH ?")
+            params.append(match)
+            order = "ORDER BY f.rank"
+        elif text:
+            criteria.append("e.name LIKE ?")
+            params.append(text.replace("*", "%").replace("?", "_"))
+        if ids is not None:
+            criteria.append(f"{key} IN ({', '.join('?' * len(ids))})")
+            params.extend(ids)
+        if after is not None:
+            criteria.append(f"{key} > ?")
+            params.append(after)
+            order = f"ORDER BY {key} LIMIT ?"
+            params.append(limit)
+        query = f"""
+        SELECT
+            g.iconId, g.name, e.secretId, e.name,
+            e.secret, e.login, e.website, e.lastAccess
+        FROM
+            {source}
+        LEFT JOIN groups g USING(groupId)
+        {"WHERE " + " AND ".join(criteria) if criteria else ""}
+        {order}
+        """  # noqa: S608
+        return query, tuple(params)
 
     def add_entry(
         self,
@@ -232,10 +673,11 @@ class Glue:
                 VALUES
                     (?, ?, ?, ?, ?);
                 """,
-                (name, secret, login, website, group),
+                (name, self._stored(secret), login, website, group),
                 fetch=-1,
             )
-        self.dirty = True
+            (identifier,) = sql.query("SELECT last_insert_rowid()")
+        self.touch(INSERTED, (identifier,))
 
     def edit_entry(  # noqa: PLR0913
         self,
@@ -268,10 +710,100 @@ class Glue:
                     groupId = ?
                 WHERE secretId = ?
                 """,
-                (name, secret, login, website, group, identifier),
+                (name, self._stored(secret), login, website, group, identifier),
                 fetch=-1,
             )
-        self.dirty = True
+        self.touch(UPDATED, (identifier,))
+
+    def add_entries(self, entries: Iterable[Sequence]) -> list[int]:
+        """Adds many secret entries in a single transaction.
+
+        Args:
+            entries: Records of `name`, `secret`, `login`, `website`, `group`,
+                in the same order as `add_entry` takes them. Trailing optional values
+                may be omitted.
+
+        Returns:
+            A list of IDs of the inserted entries, in the order of `entries`.
+        """
+        with self.querying() as sql:
+            count = sql.query_many(
+                """
+                INSERT
+                INTO secrets
+                    (name, secret, login, website, groupId)
+                VALUES
+                    (?, ?, ?, ?, ?);
+                """,
+                (self._storing(_pad(entry, 5)) for entry in entries),
+            )
+            (last,) = sql.query("SELECT last_insert_rowid()")
+        if not count:
+            return []
+        # The writer is held for the whole transaction and IDs are AUTOINCREMENT,
+        # so the batch got a contiguous range ending at the last inserted one.
+        identifiers = list(range(last - count + 1, last + 1))
+        self.touch(INSERTED, identifiers)
+        return identifiers
+
+    def edit_entries(self, entries: Iterable[Sequence]) -> int:
+        """Edits many secret entries in a single transaction.
+
+        Args:
+            entries: Records of `identifier`, `name`, `secret`, `login`, `website`, `group`,
+                in the same order as `edit_entry` takes them. Trailing optional values
+                may be omitted, clearing them.
+
+        Returns:
+            The amount of entries changed.
+        """
+        identifiers: list[int] = []
+
+        def records() -> Iterator[tuple]:
+            for identifier, *rest in entries:
+                identifiers.append(identifier)
+                yield (*self._storing(_pad(rest, 5)), identifier)
+
+        with self.querying() as sql:
+            count = sql.query_many(
+                """
+                UPDATE secrets
+                SET
+                    name = ?,
+                    secret = ?,
+                    login = ?,
+                    website = ?,
+                    groupId = ?
+                WHERE secretId = ?
+                """,
+                records(),
+            )
+        if count:
+            self.touch(UPDATED, identifiers)
+        return count
+
+    def delete_entries(self, identifiers: Iterable[int]) -> int:
+        """Delete many entries by their IDs in a single transaction.
+
+        Args:
+            identifiers: The numeric IDs of the entries
+
+        Returns:
+            The amount of entries deleted.
+        """
+        identifiers = list(identifiers)
+        with self.querying() as sql:
+            count = sql.query_many(
+                """
+                DELETE
+                FROM secrets
+                WHERE secretId = ?
+                """,
+                ((identifier,) for identifier in identifiers),
+            )
+        if count:
+            self.touch(DELETED, identifiers)
+        return count
 
     def get_entry(self, identifier: int) -> tuple[str, str, str, str, str] | None:
         """Pull up entry data by its ID.
@@ -282,7 +814,7 @@ class Glue:
         Returns:
             A tuple with `name`, `secret`, `login`, `website`, `name(groupId)` of the entry.
         """
-        return self.query(
+        row = self.query(
             """
             SELECT e.name, e.secret, e.login, e.website, g.name
             FROM secrets e
@@ -290,7 +822,114 @@ class Glue:
             WHERE e.secretId = ?
             """,
             (identifier,),
+            readonly=True,
+        )
+        if row is None:
+            return None
+        name, secret, *rest = row
+        return (name, self.unseal(secret), *rest)
+
+    def secret(self, identifier: int) -> str | None:
+        """Pull up just the secret of an entry by its ID, opening it if it's sealed.
+
+        Returns `None` if no entry is under that ID.
+        """
+        row = self.query(
+            """
+            SELECT secret
+            FROM secrets
+            WHERE secretId = ?
+            """,
+            (identifier,),
+            readonly=True,
         )
+        return None if row is None else self.unseal(row[0])
+
+    @property
+    def sealed(self) -> bool:
+        """Whether secrets get sealed one by one, see `seal_secrets`."""
+        return self._sealer is not None
+
+    def seal_secrets(self, key: bytes | None = None) -> int:
+        """Keep every secret sealed with its own nonce, only opening ones asked for.
+
+        Secrets still in plaintext get sealed right away, so call this with the record key
+        to start sealing, and also after opening a DB whose secrets are sealed already.
+        Opened secrets are cached a few at a time, see `Sealer`.
+
+        Args:
+            key: The 32-byte record key, the current one if not given
+
+        Returns:
+            The amount of secrets sealed just now.
+
+        Raises:
+            ValueError: There's no key given or set before.
+        """
+        if key is not None:
+            if self._sealer is not None:
+                self._sealer.clear()
+            self._sealer = Sealer(key)
+        if self._sealer is None:
+            raise ValueError("No record key to seal secrets with")
+        sealer = self._sealer
+        with self.querying() as sql:
+            plain = sql.query(
+                "SELECT secretId, secret FROM secrets WHERE typeof(secret) = 'text'", fetch=0
+            )
+            count = sql.query_many(
+                "UPDATE secrets SET secret = ? WHERE secretId = ?",
+                ((sealer.seal(secret), identifier) for identifier, secret in plain),
+            )
+        if count:
+            self.touch(texts=False)
+        return count
+
+    def unseal_secrets(self) -> int:
+        """Store every secret in plaintext again and stop sealing new ones.
+
+        Returns:
+            The amount of secrets unsealed.
+        """
+        if self._sealer is None:
+            return 0
+        sealer = self._sealer
+        with self.querying() as sql:
+            sealed = sql.query(
+                "SELECT secretId, secret FROM secrets WHERE typeof(secret) = 'blob'", fetch=0
+            )
+            count = sql.query_many(
+                "UPDATE secrets SET secret = ? WHERE secretId = ?",
+                ((sealer.open(secret), identifier) for identifier, secret in sealed),
+            )
+        sealer.clear()
+        self._sealer = None
+        if count:
+            self.touch(texts=False)
+        return count
+
+    def unseal(self, secret: str | bytes | None) -> str | None:
+        """Get the plaintext out of a `secret` column value, sealed or not.
+
+        Raises:
+            IncorrectError: The secret is sealed, but there's no key to open it.
+        """
+        if not isinstance(secret, bytes):
+            return secret
+        if self._sealer is None:
+            raise IncorrectError("The secret is sealed and there's no key to open it")
+        return self._sealer.open(secret)
+
+    def _stored(self, secret: str | None) -> str | bytes | None:
+        """Seal a `secret` on its way into the DB, if secrets are sealed."""
+        if self._sealer is None or secret is None:
+            return secret
+        return self._sealer.seal(secret)
+
+    def _storing(self, record: tuple) -> tuple:
+        """Seal the secret of an `add_entry`-ordered `record`, see `_stored`."""
+        name, secret, *rest = record
+        return (name, self._stored(secret), *rest)
 
     def delete_entry(self, identifier: int) -> None:
         """Delete an entry by its ID. Fire-and-forget style.
@@ -306,11 +945,11 @@ class Glue:
             """,
             (identifier,),
         )
-        self.dirty = True
+        self.touch(DELETED, (identifier,))
 
     def groups(self) -> tuple[tuple[int, str, str]]:
         """Return a tuple of group ID, name and icon ID pairs."""
-        with self.querying() as sql:
+        with self.querying(readonly=True) as sql:
             return sql.query(
                 """
                 SELECT
@@ -346,7 +985,7 @@ class Glue:
                 """,
                 (name, icon_id, identifier),
             )
-        self.dirty = True
+        self.touch(texts=False)
 
     def get_group(self, identifier: int) -> tuple[str, str] | None:
         """Get group's name and icon ID by its `identifier`.
@@ -360,6 +999,7 @@ class Glue:
             WHERE groupId = ?
             """,
             (identifier,),
+            readonly=True,
         )
 
     def delete_group(self, identifier: int) -> None:
@@ -373,4 +1013,26 @@ class Glue:
                 """,
                 (identifier,),
             )
-        self.dirty = True
+        self.touch(texts=False)
+
+
+def _match_expression(text: str) -> str | None:
+    """Turn user input into an FTS5 query where every word is a quoted prefix."""
+    words = findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+def _closeness(host: str, other: str) -> int:
+    """How far `other` is from `host` on one site: same, a parent, a subdomain or a sibling."""
+    if other == host:
+        return 0
+    if host.endswith(f".{other}"):
+        return 1
+    if other.endswith(f".{host}"):
+        return 2
+    return 3
+
+
+def _pad(record: Sequence, length: int) -> tuple:
+    """Pad `record` with `None`s up to `length` items."""
+    return (*record, *(None,) * (length - len(record)))
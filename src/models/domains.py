@@ -0,0 +1,99 @@
+"""Normalizing websites of entries to hosts and the sites they belong to, for lookups by URL."""
+
+from collections.abc import Iterable, Iterator
+from functools import lru_cache
+from ipaddress import ip_address
+from re import IGNORECASE
+from re import compile as compile_regex
+
+# An optional scheme and user info, the host and an optional port, followed by the rest or
+# nothing. It's called on every write of a website, so it's a regex rather than `urlsplit`.
+URL = compile_regex(
+    r"\s*(?:(?:[a-z][a-z0-9+.-]*:)?//)?(?:[^/?#\s]*@)?"
+    r"(\[[0-9a-f:.]+\]|[^/?#:@\s]+)(?::\d+)?(?:[/?#]|\s*$)",
+    IGNORECASE,
+)
+HOST = compile_regex(r"[a-z0-9_-]+(\.[a-z0-9_-]+)*")
+
+# Public suffixes of more than one label, under which a site takes a label more.
+# The common ones only, the whole Public Suffix List is not worth shipping for this.
+MULTI_LABEL_SUFFIXES = frozenset(
+    """
+    ac.uk co.uk gov.uk ltd.uk me.uk net.uk org.uk plc.uk
+    com.au net.au org.au edu.au gov.au
+    co.nz net.nz org.nz
+    co.jp ne.jp or.jp ac.jp go.jp
+    co.kr or.kr
+    com.br net.br org.br gov.br
+    com.cn net.cn org.cn gov.cn
+    com.hk com.sg com.tw com.my
+    co.in net.in org.in gov.in
+    co.za org.za
+    com.mx com.ar com.tr com.ua
+    com.ru msk.ru spb.ru
+    co.il co.id co.th
+    github.io gitlab.io herokuapp.com blogspot.com netlify.app
+    pages.dev vercel.app appspot.com web.app firebaseapp.com
+    """.split()  # noqa: SIM905
+)
+
+
+@lru_cache(maxsize=4096)
+def host_of(website: str | None) -> str | None:
+    """The host of a `website`, lowercased, in ASCII and without a leading "www.".
+
+    The scheme may be left out: "GitHub.com/login" gives "github.com".
+
+    Returns:
+        The host, or `None` if `website` doesn't look like a URL.
+    """
+    match = URL.match(website) if website else None
+    if match is None:
+        return None
+    host = match[1].strip("[]").rstrip(".").lower()
+    if not host:
+        return None
+    if not host.isascii():
+        try:
+            host = host.encode("idna").decode("ascii")
+        except UnicodeError:
+            return None
+    if _is_ip(host):
+        return host
+    if not HOST.fullmatch(host):
+        return None
+    return host.removeprefix("www.") if host.count(".") > 1 else host
+
+
+def site_of(host: str) -> str:
+    """The registrable domain `host` belongs to, like "google.com" for "mail.google.com".
+
+    Addresses and single-label hosts, like "localhost", are sites of their own.
+    """
+    if _is_ip(host) or "." not in host:
+        return host
+    labels = host.split(".")
+    take = 3 if ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES else 2
+    return ".".join(labels[-take:])
+
+
+def website_records(rows: Iterable[tuple[int, str | None]]) -> Iterator[tuple[int, str, str]]:
+    """Turn rows of entry IDs and websites into rows of the `websites` table, see `Glue`.
+
+    Websites that aren't URLs are left out.
+    """
+    for identifier, website in rows:
+        host = host_of(website)
+        if host is not None:
+            yield identifier, host, site_of(host)
+
+
+def _is_ip(host: str) -> bool:
+    # Addresses start with a digit or have colons, parsing every host is slower.
+    if not host[0].isdigit() and ":" not in host:
+        return False
+    try:
+        ip_address(host)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,175 @@
+"""An in-memory trigram index for fuzzy, typo-tolerant lookups of entries."""
+
+from __future__ import annotations
+
+from collections import Counter
+from collections.abc import Iterable
+from math import ceil
+from re import compile as compile_regex
+from threading import Lock
+
+WORD = compile_regex(r"\w+")
+
+# Trigrams of more than a `1 / COMMON_SHARE` of entries, and no less than `COMMON_FLOOR`,
+# are too common to pick candidates by.
+COMMON_SHARE = 16
+COMMON_FLOOR = 256
+
+
+def trigrams(*texts: str | None) -> frozenset[str]:
+    """Split `texts` into words and those into trigrams, padded so word starts weigh more.
+
+    For example, "GitHub" gives `"  g"`, `" gi"`, `"git"`, `"ith"`, `"thu"`, `"hub"` and `"ub "`.
+    """
+    words = WORD.findall(" ".join(filter(None, texts)).casefold())
+    if not words:
+        return frozenset()
+    padded = f"  {'  '.join(words)} "
+    return frozenset(map("".join, zip(padded, padded[1:], padded[2:], strict=False)))
+
+
+class TrigramIndex:
+    """Maps trigrams to the entries having them, to rank entries by how many a query shares.
+
+    Safe to search from one thread while another one updates it.
+    """
+
+    def __init__(self, min_score: float = 0.5):
+        """Spawn an empty index.
+
+        Args:
+            min_score: The share of query trigrams an entry must have to match at all
+        """
+        self.min_score = min_score
+        self._postings: dict[str, set[int]] = {}
+        self._grams: dict[int, frozenset[str]] = {}
+        # Entries by how many trigrams they have, fewer is a closer match.
+        self._sizes: dict[int, set[int]] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        """How many entries are indexed."""
+        return len(self._grams)
+
+    def add(self, identifier: int, *texts: str | None) -> None:
+        """Index `texts` of the entry under `identifier`, replacing what was indexed for it."""
+        self.add_many(((identifier, *texts),))
+
+    def add_many(self, records: Iterable[tuple]) -> None:
+        """Index many records of the ID and the texts of an entry, see `add`."""
+        with self._lock:
+            postings = self._postings
+            for identifier, *texts in records:
+                self._discard(identifier)
+                grams = self._grams[identifier] = trigrams(*texts)
+                self._sizes.setdefault(len(grams), set()).add(identifier)
+                for gram in grams:
+                    posting = postings.get(gram)
+                    if posting is None:
+                        postings[gram] = {identifier}
+                    else:
+                        posting.add(identifier)
+
+    def remove(self, identifier: int) -> None:
+        """Forget the entry under `identifier`, if it's indexed."""
+        with self._lock:
+            self._discard(identifier)
+
+    def clear(self) -> None:
+        """Forget every entry."""
+        with self._lock:
+            self._postings.clear()
+            self._grams.clear()
+            self._sizes.clear()
+
+    def search(self, query: str, limit: int | None = None) -> list[int]:
+        """Rank entries by how well they match `query`, the best first.
+
+        Entries sharing more of the query trigrams go first, then the ones with fewer
+        trigrams of their own, so "gthub" finds "GitHub" ahead of "GitHub Enterprise".
+
+        Args:
+            query: The text to look for, typos and all
+            limit: How many IDs to return at most, all matching if `None`
+
+        Returns:
+            The IDs of matching entries.
+        """
+        wanted = trigrams(query)
+        if not wanted:
+            return []
+        need = max(1, ceil(len(wanted) * self.min_score))
+        with self._lock:
+            postings = sorted((self._postings.get(gram, set()) for gram in wanted), key=len)
+            # Rare trigrams pick candidates, common ones are only checked against, in C.
+            cutoff = max(COMMON_FLOOR, len(self._grams) // COMMON_SHARE)
+            split = next((i for i, posting in enumerate(postings) if len(posting) > cutoff), None)
+            rare, common = postings[:split], postings[len(postings) if split is None else split :]
+            # Entries without rare trigrams share `len(common)` of them at most.
+            most = len(common)
+            counts = Counter()
+            for posting in rare:
+                counts.update(posting)
+            hits = {}
+            for identifier, found in counts.items():
+                if found + most >= need:
+                    count = found + sum(identifier in posting for posting in common)
+                    if count >= need:
+                        hits[identifier] = count
+            ranked = sorted(hits, key=lambda i: (-hits[i], self._size(i)))
+            if most < need:
+                return ranked[:limit]
+            better = [i for i in ranked if hits[i] > most]
+            room = None if limit is None else limit - len(better)
+            if room is not None and room <= 0:
+                return better[:limit]
+            same = self._having(common, hits, room)
+            worse = [i for i in ranked if hits[i] < most]
+            # Entries with common trigrams only may outrank worse ones, so they're counted in
+            # unless the same ones alone fill the room up.
+            if most > need and (room is None or len(same) < room):
+                counts.clear()
+                for posting in common:
+                    counts.update(posting)
+                for identifier, count in counts.items():
+                    if need <= count < most and identifier not in hits:
+                        hits[identifier] = count
+                        worse.append(identifier)
+                worse.sort(key=lambda i: (-hits[i], self._size(i)))
+        return (better + same + worse)[:limit]
+
+    def _having(self, common: list[set[int]], hits: dict[int, int], limit: int | None) -> list[int]:
+        """Up to `limit` entries sharing `len(common)` trigrams, the ones with fewer first.
+
+        Those are entries with all `common` trigrams and none of the rest, or already counted
+        in `hits` with as many. There may be plenty, so they're gathered size by size.
+        """
+        most = len(common)
+        counted = {}
+        for identifier, count in hits.items():
+            if count == most:
+                counted.setdefault(len(self._grams[identifier]), set()).add(identifier)
+        picked: list[int] = []
+        for length in sorted(self._sizes):
+            if limit is not None and len(picked) >= limit:
+                break
+            found = self._sizes[length].intersection(*common).difference(hits)
+            picked.extend(sorted(found.union(counted.get(length, ()))))
+        return picked[:limit]
+
+    def _size(self, identifier: int) -> tuple[int, int]:
+        return len(self._grams[identifier]), identifier
+
+    def _discard(self, identifier: int) -> None:
+        grams = self._grams.pop(identifier, None)
+        if grams is None:
+            return
+        bucket = self._sizes[len(grams)]
+        bucket.discard(identifier)
+        if not bucket:
+            del self._sizes[len(grams)]
+        for gram in grams:
+            posting = self._postings[gram]
+            posting.discard(identifier)
+            if not posting:
+                del self._postings[gram]
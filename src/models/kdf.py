@@ -0,0 +1,139 @@
+"""Password-based key derivation functions a vault can be locked with.
+
+A KDF is described by a spec, a JSON-friendly `dict` with the KDF `name` and its cost
+parameters, which gets stored in the vault header next to the salt.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from functools import cache
+from math import log2
+from time import perf_counter
+from typing import Any
+
+from cryptography.exceptions import UnsupportedAlgorithm
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+from ..errors import IncorrectError
+
+try:
+    from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+except ImportError:  # cryptography < 44
+    Argon2id = None
+
+KEY_LENGTH = 32
+
+# Sane costs for when there's no calibration at hand.
+DEFAULTS: dict[str, dict[str, Any]] = {
+    "pbkdf2": {"name": "pbkdf2", "iterations": 600_000},
+    "scrypt": {"name": "scrypt", "n": 2**17, "r": 8, "p": 1},
+    "argon2id": {"name": "argon2id", "iterations": 3, "lanes": 4, "memory": 64 * 1024},
+}
+
+# Calibration never goes below these, however slow the machine is.
+FLOORS: dict[str, dict[str, Any]] = {
+    "pbkdf2": {"name": "pbkdf2", "iterations": 210_000},
+    "scrypt": {"name": "scrypt", "n": 2**15, "r": 8, "p": 1},
+    "argon2id": {"name": "argon2id", "iterations": 1, "lanes": 4, "memory": 19 * 1024},
+}
+
+
+def _pbkdf2(password: bytes, salt: bytes, spec: dict[str, Any]) -> bytes:
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=KEY_LENGTH,
+        salt=salt,
+        iterations=spec["iterations"],
+        backend=default_backend(),
+    )
+    return kdf.derive(password)
+
+
+def _scrypt(password: bytes, salt: bytes, spec: dict[str, Any]) -> bytes:
+    kdf = Scrypt(salt=salt, length=KEY_LENGTH, n=spec["n"], r=spec["r"], p=spec["p"])
+    return kdf.derive(password)
+
+
+def _argon2id(password: bytes, salt: bytes, spec: dict[str, Any]) -> bytes:
+    if Argon2id is None:
+        raise UnsupportedAlgorithm("Argon2id needs a newer cryptography")
+    kdf = Argon2id(
+        salt=salt,
+        length=KEY_LENGTH,
+        iterations=spec["iterations"],
+        lanes=spec["lanes"],
+        memory_cost=spec["memory"],
+    )
+    return kdf.derive(password)
+
+
+KDFS: dict[str, Callable[[bytes, bytes, dict[str, Any]], bytes]] = {
+    "pbkdf2": _pbkdf2,
+    "scrypt": _scrypt,
+    "argon2id": _argon2id,
+}
+
+
+def derive(password: str, salt: bytes, spec: dict[str, Any]) -> bytes:
+    """Derive a key from `password` and `salt` as `spec` says.
+
+    Raises:
+        IncorrectError: The spec names an unknown KDF or lacks parameters.
+        UnsupportedAlgorithm: The KDF isn't available on this machine.
+    """
+    try:
+        return KDFS[spec["name"]](password.encode(), salt, spec)
+    except (KeyError, TypeError) as e:
+        raise IncorrectError(f"Bad KDF spec: {spec}") from e
+
+
+@cache
+def available() -> tuple[str, ...]:
+    """Names of KDFs usable on this machine, the preferred one first."""
+    names = ["argon2id", "scrypt", "pbkdf2"]
+    try:
+        _argon2id(b"probe", b"0" * 16, {"iterations": 1, "lanes": 1, "memory": 8})
+    except UnsupportedAlgorithm:
+        names.remove("argon2id")
+    return tuple(names)
+
+
+def default() -> dict[str, Any]:
+    """The spec of the preferred KDF with its default costs."""
+    return dict(DEFAULTS[available()[0]])
+
+
+def calibrate(name: str | None = None, target: float = 0.5) -> dict[str, Any]:
+    """Pick costs so deriving a key with `name` takes about `target` seconds on this machine.
+
+    Args:
+        name: The KDF to calibrate, the preferred one if not given
+        target: The desired derivation time, in seconds
+
+    Returns:
+        The spec, never cheaper than `FLOORS`.
+    """
+    floor = FLOORS[name or available()[0]]
+    scale = target / _time(floor)
+    spec = dict(floor)
+    match spec["name"]:
+        case "pbkdf2":
+            spec["iterations"] = max(floor["iterations"], int(floor["iterations"] * scale))
+        case "scrypt":
+            # Doubling n doubles both time and memory, so stay between 32 MiB and 1 GiB.
+            spec["n"] = 2 ** min(20, max(15, int(log2(floor["n"] * scale))))
+        case "argon2id":
+            # Spend the budget on memory first, up to 256 MiB, then on passes.
+            spec["memory"] = min(256 * 1024, max(floor["memory"], int(floor["memory"] * scale)))
+            spec["iterations"] = max(1, int(scale * floor["memory"] / spec["memory"]))
+    return spec
+
+
+def _time(spec: dict[str, Any]) -> float:
+    start = perf_counter()
+    derive("calibration", b"0" * 16, spec)
+    return perf_counter() - start
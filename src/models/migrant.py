@@ -1,39 +1,172 @@
 """An utility for updating the DB."""
 
-from sqlite3 import Connection
+from collections.abc import Callable
+from sqlite3 import Connection, Cursor, DatabaseError, OperationalError
 
-# Image an upgrade_or_stall function here.
+from ..errors import IncorrectError, OutdatedError
+from .domains import website_records
+
+BASELINE = """
+-- 0.0.1
+CREATE TABLE secrets (
+    secretId INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    secret TEXT NOT NULL,
+    login TEXT,
+    website TEXT,
+    groupId INTEGER,
+    lastAccess TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(groupId) REFERENCES groups(groupId) ON DELETE SET NULL
+);
+CREATE TABLE groups (
+    groupId INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    iconId TEXT DEFAULT "key"
+);
+CREATE TABLE db_version (
+    version TEXT NOT NULL,
+    upgradedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+INSERT
+INTO db_version(version)
+VALUES ('0.0.1');
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS secrets_group ON secrets(groupId);
+CREATE INDEX IF NOT EXISTS secrets_name ON secrets(name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS secrets_website ON secrets(website);
+"""
+
+SEARCH_INDEX = """
+CREATE VIRTUAL TABLE IF NOT EXISTS secrets_fts USING fts5(
+    name, login, website,
+    content='secrets', content_rowid='secretId'
+);
+CREATE TRIGGER IF NOT EXISTS secrets_fts_insert AFTER INSERT ON secrets BEGIN
+    INSERT INTO secrets_fts(rowid, name, login, website)
+    VALUES (new.secretId, new.name, new.login, new.website);
+END;
+CREATE TRIGGER IF NOT EXISTS secrets_fts_delete AFTER DELETE ON secrets BEGIN
+    INSERT INTO secrets_fts(secrets_fts, rowid, name, login, website)
+    VALUES ('delete', old.secretId, old.name, old.login, old.website);
+END;
+CREATE TRIGGER IF NOT EXISTS secrets_fts_update
+AFTER UPDATE OF name, login, website ON secrets BEGIN
+    INSERT INTO secrets_fts(secrets_fts, rowid, name, login, website)
+    VALUES ('delete', old.secretId, old.name, old.login, old.website);
+    INSERT INTO secrets_fts(rowid, name, login, website)
+    VALUES (new.secretId, new.name, new.login, new.website);
+END;
+INSERT INTO secrets_fts(secrets_fts) VALUES ('rebuild');
+"""
+
+# Hosts and sites of entry websites, see `domains`. Rows are written by the app, while
+# triggers drop the ones of entries deleted or given another website, even by other apps.
+WEBSITE_INDEX = """
+CREATE TABLE IF NOT EXISTS websites (
+    secretId INTEGER PRIMARY KEY REFERENCES secrets(secretId) ON DELETE CASCADE,
+    host TEXT NOT NULL,
+    site TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS websites_site ON websites(site);
+CREATE TRIGGER IF NOT EXISTS secrets_websites_delete AFTER DELETE ON secrets BEGIN
+    DELETE FROM websites WHERE secretId = old.secretId;
+END;
+CREATE TRIGGER IF NOT EXISTS secrets_websites_update AFTER UPDATE OF website ON secrets
+WHEN old.website IS NOT new.website BEGIN
+    DELETE FROM websites WHERE secretId = old.secretId;
+END;
+"""
+
+
+def _fill_websites(cursor: Cursor) -> None:
+    rows = cursor.execute("SELECT secretId, website FROM secrets WHERE website IS NOT NULL")
+    cursor.executemany(
+        "INSERT OR REPLACE INTO websites(secretId, host, site) VALUES (?, ?, ?)",
+        website_records(rows.fetchall()),
+    )
+
+
+# Ordered upgrade steps, each one bringing the DB up to the version it's listed under.
+MIGRATIONS: tuple[tuple[str, str], ...] = (
+    ("0.0.2", INDEXES),
+    ("0.0.3", SEARCH_INDEX),
+    ("0.0.4", WEBSITE_INDEX),
+)
+
+# Data some upgrade steps fill in past their scripts, as SQL alone can't.
+BACKFILLS: dict[str, Callable[[Cursor], None]] = {"0.0.4": _fill_websites}
+
+LATEST = MIGRATIONS[-1][0]
 
 
 def init(conn: Connection) -> None:
     """Initialize the DB to the latest version."""
-    # mockup, will implement a better solution in later versions.
-    sql = """
-    -- 0.0.1
-    CREATE TABLE secrets (
-        secretId INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        secret TEXT NOT NULL,
-        login TEXT,
-        website TEXT,
-        groupId INTEGER,
-        lastAccess TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY(groupId) REFERENCES groups(groupId) ON DELETE SET NULL
-    );
-    CREATE TABLE groups (
-        groupId INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        iconId TEXT DEFAULT "key"
-    );
-    CREATE TABLE db_version (
-        version TEXT NOT NULL,
-        upgradedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    INSERT
-    INTO db_version(version)
-    VALUES ('0.0.1');
-    """
     cursor = conn.cursor()
-    cursor.executescript(sql)
+    cursor.executescript(BASELINE)
     conn.commit()
     cursor.close()
+    upgrade_or_stall(conn)
+
+
+def version(conn: Connection) -> str:
+    """Get the version of the DB schema.
+
+    Raises:
+        IncorrectError: The DB doesn't look like a Lock and Key one.
+    """
+    try:
+        row = conn.execute("SELECT version FROM db_version ORDER BY rowid DESC").fetchone()
+    except DatabaseError as e:
+        raise IncorrectError("Not a Lock and Key database") from e
+    if row is None:
+        raise IncorrectError("Database version is missing")
+    return row[0]
+
+
+def upgrade_or_stall(conn: Connection) -> bool:
+    """Apply every upgrade step the DB hasn't seen yet, each in its own transaction.
+
+    Returns:
+        Whether anything was upgraded.
+
+    Raises:
+        IncorrectError: The DB doesn't look like a Lock and Key one.
+        OutdatedError: The DB was made by a newer version of the app.
+    """
+    current = _parse(version(conn))
+    if current > _parse(LATEST):
+        raise OutdatedError(f"Database is newer than {LATEST}, please update Lock and Key")
+    upgraded = False
+    for target, script in MIGRATIONS:
+        if _parse(target) <= current:
+            continue
+        _apply(conn, target, script)
+        upgraded = True
+    return upgraded
+
+
+def _apply(conn: Connection, target: str, script: str) -> None:
+    cursor = conn.cursor()
+    try:
+        try:
+            cursor.executescript(f"BEGIN; {script}")
+            if target in BACKFILLS:
+                BACKFILLS[target](cursor)
+        except OperationalError as e:
+            conn.rollback()
+            if "fts5" not in str(e):
+                raise
+            # SQLite built without FTS5, searching falls back to `LIKE`.
+        cursor.execute("INSERT INTO db_version(version) VALUES (?)", (target,))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _parse(value: str) -> tuple[int, ...]:
+    return tuple(int(part) for part in value.split("."))
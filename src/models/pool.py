@@ -0,0 +1,120 @@
+"""A tiny pool of long-lived SQLite connections."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from queue import Empty, LifoQueue
+from sqlite3 import Connection, connect
+from threading import Lock, RLock, get_ident
+
+# Applied once, right after a connection is opened.
+# Recursive triggers make `INSERT OR REPLACE` fire delete triggers, keeping indexes in sync.
+WRITER_PRAGMAS = ("PRAGMA temp_store = MEMORY", "PRAGMA recursive_triggers = ON")
+READER_PRAGMAS = ("PRAGMA temp_store = MEMORY", "PRAGMA query_only = ON")
+
+
+class ConnectionPool:
+    """Owns one writer connection and up to `readers` reader connections to a single DB.
+
+    The writer is guarded by a re-entrant lock, so nested write contexts on one thread share
+    a single transaction, committed when the outermost one exits. Reads issued by the thread
+    currently holding the writer are served by the writer itself, so they see its uncommitted
+    changes instead of bumping into its locks.
+    """
+
+    def __init__(self, uri: str, readers: int = 2, timeout: int = 10):
+        """Opens the writer connection. Readers are opened lazily.
+
+        Args:
+            uri: The `str` URI to the database
+            readers: How many reader connections to keep at most. If 0, reads use the writer
+            timeout: Timeout (in seconds) of waiting for a locked DB or a free connection
+        """
+        self.uri = uri
+        self.readers = max(readers, 0)
+        self.timeout = timeout
+        self._write_lock = RLock()
+        self._owner: int | None = None
+        self._depth = 0
+        self._spawn_lock = Lock()
+        self._spawned: list[Connection] = []
+        self._idle: LifoQueue[Connection] = LifoQueue()
+        self._closed = False
+        self._writer = self._spawn(WRITER_PRAGMAS)
+
+    @property
+    def writer(self) -> Connection:
+        """The raw writer connection. Don't use it without holding `writing()`."""
+        return self._writer
+
+    def _spawn(self, pragmas: tuple[str, ...]) -> Connection:
+        conn = connect(self.uri, uri=True, timeout=self.timeout, check_same_thread=False)
+        for pragma in pragmas:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def writing(self) -> Iterator[Connection]:
+        """Borrow the writer connection, committing on success and rolling back on failure."""
+        if not self._write_lock.acquire(timeout=self.timeout):
+            raise TimeoutError("The writer connection is busy")
+        owner, self._owner = self._owner, get_ident()
+        self._depth += 1
+        try:
+            yield self._writer
+        except BaseException:
+            if self._depth == 1:
+                self._writer.rollback()
+            raise
+        else:
+            if self._depth == 1:
+                self._writer.commit()
+        finally:
+            self._depth -= 1
+            self._owner = owner
+            self._write_lock.release()
+
+    @contextmanager
+    def reading(self) -> Iterator[Connection]:
+        """Borrow a read-only connection, falling back to the writer where it makes sense."""
+        if not self.readers or self._owner == get_ident():
+            with self.writing() as conn:
+                yield conn
+            return
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+
+    def _acquire(self) -> Connection:
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        with self._spawn_lock:
+            if len(self._spawned) < self.readers:
+                conn = self._spawn(READER_PRAGMAS)
+                self._spawned.append(conn)
+                return conn
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except Empty as e:
+            raise TimeoutError("No reader connection was freed up in time") from e
+
+    def close(self) -> None:
+        """Close every connection. Readers still borrowed are closed once given back."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                break
+        with self._write_lock:
+            self._writer.close()
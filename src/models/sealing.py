@@ -0,0 +1,62 @@
+"""Per-record encryption of secrets inside the DB."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from os import urandom
+from threading import Lock
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from ..errors import IncorrectError
+
+NONCE_SIZE = 12
+
+
+class Sealer:
+    """Seals secrets one by one, opening them on demand and remembering the latest few."""
+
+    def __init__(self, key: bytes, cache_size: int = 64):
+        """Start sealing with `key`.
+
+        Args:
+            key: The 32-byte record key
+            cache_size: How many opened secrets to keep around
+        """
+        self.key = key
+        self.cache_size = cache_size
+        self._aead = AESGCM(key)
+        self._cache: OrderedDict[bytes, str] = OrderedDict()
+        self._lock = Lock()
+
+    def seal(self, secret: str) -> bytes:
+        """Encrypt a `secret` with a fresh nonce, returning `nonce | ciphertext | tag`."""
+        nonce = urandom(NONCE_SIZE)
+        return nonce + self._aead.encrypt(nonce, secret.encode(), None)
+
+    def open(self, sealed: bytes) -> str:
+        """Decrypt a `sealed` secret, or pull it up from the cache.
+
+        Raises:
+            IncorrectError: The secret was sealed with another key or is damaged.
+        """
+        with self._lock:
+            secret = self._cache.get(sealed)
+            if secret is not None:
+                self._cache.move_to_end(sealed)
+                return secret
+        try:
+            secret = self._aead.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], None).decode()
+        except InvalidTag as e:
+            raise IncorrectError("Secret can't be opened with this key") from e
+        with self._lock:
+            self._cache[sealed] = secret
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return secret
+
+    def clear(self) -> None:
+        """Forget every opened secret."""
+        with self._lock:
+            self._cache.clear()
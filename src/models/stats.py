@@ -0,0 +1,88 @@
+"""Opt-in query timing for the DB Glue."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import deque
+from threading import Lock
+from time import time
+from typing import Any
+
+from ..utils.logger import info, warning
+
+# Upper bounds (in milliseconds) of latency histogram buckets, the last bucket is unbounded.
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class QueryStats:
+    """Collects per-statement latency histograms, row counts and a log of slow queries."""
+
+    def __init__(self, slow_ms: float = 50.0, slow_log: int = 100):
+        """Start collecting.
+
+        Args:
+            slow_ms: Queries taking longer than this (in milliseconds) get logged as slow
+            slow_log: How many of the latest slow queries to remember
+        """
+        self.slow_ms = slow_ms
+        self._statements: dict[str, dict[str, Any]] = {}
+        self._slow: deque[dict[str, Any]] = deque(maxlen=slow_log)
+        self._lock = Lock()
+
+    def record(self, sql: str, seconds: float, rows: int) -> None:
+        """Account for a single statement run.
+
+        Args:
+            sql: The SQL of the statement
+            seconds: How long it took, from execution to the last fetched row
+            rows: How many rows it returned or modified
+        """
+        statement = " ".join(sql.split())
+        ms = seconds * 1000
+        with self._lock:
+            entry = self._statements.get(statement)
+            if entry is None:
+                entry = self._statements[statement] = {
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "histogram": [0] * (len(BUCKETS) + 1),
+                }
+            entry["count"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            entry["rows"] += rows
+            entry["histogram"][bisect_left(BUCKETS, ms)] += 1
+            if ms > self.slow_ms:
+                self._slow.append({"sql": statement, "ms": ms, "rows": rows, "at": time()})
+        if ms > self.slow_ms:
+            warning(f"Slow query ({ms:.1f} ms, {rows} rows): {statement}")
+
+    def snapshot(self) -> dict[str, Any]:
+        """Get a copy of everything collected so far.
+
+        Returns:
+            A `dict` with `statements`, mapping SQL to its `count`, `total_ms`, `max_ms`,
+            `rows` and `histogram` (counts per `BUCKETS` upper bound, plus one overflow bucket),
+            `slow`, a list of the latest slow queries, and `buckets`, the bucket bounds.
+        """
+        with self._lock:
+            return {
+                "statements": {
+                    sql: {**entry, "histogram": list(entry["histogram"])}
+                    for sql, entry in self._statements.items()
+                },
+                "slow": list(self._slow),
+                "buckets": BUCKETS,
+            }
+
+    def report(self, top: int = 10) -> None:
+        """Log the statements that took the most time in total."""
+        statements = self.snapshot()["statements"]
+        ranking = sorted(statements.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        for sql, entry in ranking[:top]:
+            info(
+                f"{entry['count']}x, {entry['total_ms']:.1f} ms total, "
+                f"{entry['max_ms']:.1f} ms max, {entry['rows']} rows: {sql}"
+            )
@@ -0,0 +1,60 @@
+"""This module provides saving on its own once changes settle down."""
+
+from collections.abc import Callable
+
+from PyQt6.QtCore import QObject, QTimer
+
+
+class Autosaver(QObject):
+    """Calls `save` once changes stop for `idle_ms`, or `max_ms` after the first unsaved one.
+
+    Changes are reported with `poke`. A burst of them, like a CSV restore, ends in one save,
+    and a steady trickle of them still gets saved every `max_ms` at the latest.
+    """
+
+    def __init__(
+        self, save: Callable[[], None], idle_ms: int, max_ms: int, parent: QObject | None = None
+    ):
+        """Set the autosaver up, enabled.
+
+        Args:
+            save: The function that saves, called on the GUI thread
+            idle_ms: How long changes have to stop before saving, in milliseconds
+            max_ms: How long a change may stay unsaved at most, in milliseconds
+            parent: The owner of the autosaver
+        """
+        super().__init__(parent)
+        self.save = save
+        self.enabled = True
+        self._idle = QTimer(self)
+        self._idle.setSingleShot(True)
+        self._idle.timeout.connect(self._fire)
+        self._deadline = QTimer(self)
+        self._deadline.setSingleShot(True)
+        self._deadline.timeout.connect(self._fire)
+        self.configure(True, idle_ms, max_ms)
+
+    def configure(self, enabled: bool, idle_ms: int, max_ms: int) -> None:
+        """Change the delays, taking effect from the next change. Disabling drops a pending save."""
+        self.enabled = enabled
+        self._idle.setInterval(idle_ms)
+        self._deadline.setInterval(max(idle_ms, max_ms))
+        if not enabled:
+            self.cancel()
+
+    def poke(self, *_) -> None:
+        """Report a change, pushing the save back until changes settle down or time's up."""
+        if not self.enabled:
+            return
+        self._idle.start()
+        if not self._deadline.isActive():
+            self._deadline.start()
+
+    def cancel(self) -> None:
+        """Drop the scheduled save, if any, like when the changes got saved some other way."""
+        self._idle.stop()
+        self._deadline.stop()
+
+    def _fire(self) -> None:
+        self.cancel()
+        self.save()
@@ -1,13 +1,16 @@
 """This module provides a database creation modal."""
 
-from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtCore import QSettings, pyqtSignal
 from PyQt6.QtWidgets import QDialog, QDialogButtonBox, QFileDialog, QLabel, QLineEdit, QPushButton
 from PyQt6.uic.load_ui import loadUi
 
-from ..models.cryptid import bytes_to_file
+from ..models import kdf
+from ..models.cryptid import Session
 from ..models.db import Glue
 from ..resources import ui_path
+from ..utils.logger import error
 from .icons import Icons
+from .workers import Task
 
 
 class CreationDialog(QDialog):
@@ -40,6 +43,7 @@ class CreationDialog(QDialog):
         self.browseButton.clicked.connect(self._pick_path)
 
         self.save_to: str = ""
+        self._task: Task | None = None
 
     def _hide_n_seek(self) -> None:
         if self.passwordEdit.echoMode() == QLineEdit.EchoMode.Normal:
@@ -50,16 +54,42 @@ class CreationDialog(QDialog):
             self.showButton.setIcon(Icons.invisible)
 
     def save(self) -> None:
-        """Actually creates the database, validates inputs."""
+        """Actually creates the database on a worker thread, validates inputs."""
         if not self._compare():
             return
         if not self.save_to:
             self.warn(self.tr("Save path is not selected."))
             return
-        gl = Glue.new()
-        bytes_to_file(self.save_to, self.passwordEdit.text(), gl.to_bytes())
+        target = QSettings("VIDEVSYS", "lockandkey").value("unlock_ms", 500, int) / 1000
+        task = Task(_create_vault, self.save_to, self.passwordEdit.text(), target)
+        task.signals.done.connect(self._created)
+        task.signals.failed.connect(self._failed)
+        self._task = task
+        self._set_busy(True)
+        task.start()
+
+    def reject(self) -> None:
+        """Closes the dialog, unless it's busy creating the database."""
+        if self._task is None:
+            super().reject()
+
+    def _set_busy(self, busy: bool) -> None:
+        self.passwordEdit.setEnabled(not busy)
+        self.repeatEdit.setEnabled(not busy)
+        self.browseButton.setEnabled(not busy)
+        self.buttonBox.setEnabled(not busy)
+        self.warn(self.tr("Creating...") if busy else "")
+
+    def _created(self, _: None) -> None:
+        self._task = None
         self.complete.emit(self.save_to)
-        self.close()
+        self.accept()
+
+    def _failed(self, e: Exception) -> None:
+        self._task = None
+        self._set_busy(False)
+        error(f"Can't create {self.save_to}: {e}")
+        self.warn(self.tr("Can't create the database there."))
 
     def _compare(self) -> bool:
         first = self.passwordEdit.text()
@@ -95,3 +125,20 @@ class CreationDialog(QDialog):
 
         self.pathLabel.setText(f"{self.tr('Save to:')} {path}")
         self.save_to = path
+
+
+def _create_vault(path: str, password: str, target: float) -> None:
+    """Create an empty vault at `path` locked with `password`. Meant for a worker thread.
+
+    Args:
+        path: Where to store the vault
+        password: The password to lock it with
+        target: How long unlocking should take on this machine, in seconds
+    """
+    glue = Glue.new()
+    try:
+        # Tune the KDF cost so unlocking takes about as long as the user asked for.
+        spec = kdf.calibrate(target=target)
+        Session.create(path, password, spec).save(glue.to_bytes())
+    finally:
+        glue.close()
@@ -0,0 +1,231 @@
+"""This module provides the table model listing entries of a Glue a page at a time."""
+
+from bisect import bisect_left
+from collections.abc import Iterable
+from typing import Any
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, QObject, Qt
+from PyQt6.QtGui import QIcon
+
+from ..models.db import DELETED, INSERTED, RESET, Glue
+from .icons import Icons
+
+SEALED_MASK = "*" * 8
+
+
+class EntriesModel(QAbstractTableModel):
+    """Lists entries of a Glue, fetching them a `page` at a time as the view scrolls down.
+
+    Rows are kept as the ID, the group icon and the cells ready to show, which holds everything
+    but the secrets themselves: those are pulled from the Glue on demand.
+    Fetched rows are in ascending ID order, so changes can be applied row by row, see `apply`,
+    except for text queries: those are `ranked` by `Glue.find`, best matches first, and are
+    fetched over on every change instead.
+    """
+
+    def __init__(self, parent: QObject | None = None, page: int = 200):
+        """Spawn an empty model, fill it with `load`.
+
+        Args:
+            parent: The owner of the model
+            page: How many entries to fetch at once
+        """
+        super().__init__(parent)
+        self.page = page
+        self.glue: Glue | None = None
+        self.text: str | None = None
+        self.group: int | None = None
+        self.ranked = False
+        self._rows: list[tuple[int, QIcon | None, tuple[str, ...]]] = []
+        # The last fetched ID, or how many rows are fetched if `ranked`.
+        self._after = 0
+        self._exhausted = True
+        self._headers = (
+            self.tr("Group"),
+            self.tr("Name"),
+            self.tr("Secret"),
+            self.tr("Login"),
+            self.tr("Website"),
+            self.tr("Last accessed"),
+        )
+
+    def load(
+        self,
+        glue: Glue | None,
+        text: str | None = None,
+        group: int | None = None,
+        first_page: list[tuple] | None = None,
+    ) -> None:
+        """Start listing entries of `glue` matching `text` in `group` over, from the first page.
+
+        Args:
+            glue: The Glue to list entries of, nothing's listed if `None`
+            text: The text query to rank by, see `Glue.find`
+            group: The group ID to filter for
+            first_page: The first page, if it's already fetched, like on a worker
+        """
+        self.beginResetModel()
+        self.glue, self.text, self.group = glue, text, group
+        self.ranked = bool(text)
+        self._rows = []
+        self._after = 0
+        self._exhausted = glue is None
+        self.endResetModel()
+        if first_page is None:
+            self.fetchMore()
+        elif glue is not None:
+            self._append(first_page)
+
+    def reload(self) -> None:
+        """Fetch the rows fetched so far over, for when it's unclear which of them changed."""
+        if self.glue is None:
+            return
+        limit = max(len(self._rows), self.page)
+        rows = self._fetch(0, limit)
+        self.beginResetModel()
+        self._rows = [_cells(row) for row in rows]
+        self._after = len(rows) if self.ranked else (rows[-1][2] if rows else 0)
+        self._exhausted = len(rows) < limit
+        self.endResetModel()
+
+    def apply(self, kind: str, identifiers: Iterable[int]) -> None:
+        """Bring the rows up to date with a change reported by `Glue.on_entries`.
+
+        Only the rows affected get touched, so views keep their selection and scroll position,
+        except on resets and in `ranked` listings, which `reload` everything.
+        """
+        if self.glue is None:
+            return
+        if kind == RESET or self.ranked:
+            # A change may move any entry up or down the ranking.
+            self.reload()
+            return
+        if kind == INSERTED:
+            # New IDs go after every fetched one, fetched along with the rest if not yet.
+            if self._exhausted:
+                self._exhausted = False
+                self.fetchMore()
+            return
+        # Entries past the fetched ones will be fetched as they are now anyway, if any are left.
+        fetched = sorted(i for i in identifiers if i <= self._after or self._exhausted)
+        if not fetched:
+            return
+        fresh = {}
+        if kind != DELETED:
+            rows = self.glue.entries_by_ids(fetched, text=self.text, group=self.group)
+            fresh = {row[2]: row for row in rows}
+        for identifier in fetched:
+            row = self.row_of(identifier)
+            new = fresh.get(identifier)
+            if row is not None and new is not None:
+                self._rows[row] = _cells(new)
+                self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+            elif row is not None:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                self.endRemoveRows()
+            elif new is not None:
+                # It didn't match the filters before, but does now.
+                row = bisect_left(self._rows, identifier, key=lambda cells: cells[0])
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._rows.insert(row, _cells(new))
+                self.endInsertRows()
+                self._after = max(self._after, identifier)
+
+    def row_of(self, identifier: int) -> int | None:
+        """The row of the entry under `identifier`, if it's fetched."""
+        if self.ranked:
+            return next((i for i, cells in enumerate(self._rows) if cells[0] == identifier), None)
+        row = bisect_left(self._rows, identifier, key=lambda cells: cells[0])
+        if row < len(self._rows) and self._rows[row][0] == identifier:
+            return row
+        return None
+
+    def entry_id(self, row: int) -> int | None:
+        """The DB ID of the entry in `row`, if it's fetched."""
+        if 0 <= row < len(self._rows):
+            return self._rows[row][0]
+        return None
+
+    def rowCount(self, parent: QModelIndex | None = None) -> int:  # noqa: N802
+        """How many entries are fetched so far."""
+        if parent is not None and parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def columnCount(self, parent: QModelIndex | None = None) -> int:  # noqa: N802
+        """Group, name, secret, login, website and last access."""
+        if parent is not None and parent.isValid():
+            return 0
+        return len(self._headers)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        """Show a cell of a fetched entry. `UserRole` gives its DB ID in any column."""
+        # Views ask for every role of every visible cell, so this is kept cheap.
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        secret_id, icon, cells = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return cells[index.column()]
+        if role == Qt.ItemDataRole.UserRole:
+            return secret_id
+        if role == Qt.ItemDataRole.DecorationRole and index.column() == 0:
+            return icon
+        return None
+
+    def headerData(  # noqa: N802
+        self,
+        section: int,
+        orientation: Qt.Orientation,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ) -> Any:
+        """Name the columns, and leave the rows unnamed."""
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self._headers[section]
+        return section + 1
+
+    def canFetchMore(self, parent: QModelIndex | None = None) -> bool:  # noqa: N802
+        """Whether there are entries left past the fetched ones."""
+        if parent is not None and parent.isValid():
+            return False
+        if self.ranked and self.glue is not None and not self.glue.fuzzy_ready:
+            # The fuzzy index is being rebuilt, the search is run over once it is.
+            return False
+        return not self._exhausted
+
+    def fetchMore(self, parent: QModelIndex | None = None) -> None:  # noqa: N802
+        """Fetch the next page of entries, appending them to the rows."""
+        if self.glue is None or not self.canFetchMore(parent):
+            return
+        self._append(self._fetch(self._after, self.page))
+
+    def _fetch(self, after: int, limit: int) -> list[tuple]:
+        """Fetch `limit` entries past the ID `after`, or past the row `after` if `ranked`."""
+        if self.glue is None:
+            return []
+        if not self.ranked:
+            return self.glue.entries_page(after, limit, text=self.text, group=self.group)
+        # Rankings can't be picked up where they left off, so they're fetched from the top.
+        return self.glue.find(self.text or "", group=self.group, limit=after + limit)[after:]
+
+    def _append(self, rows: list[tuple]) -> None:
+        """Add a freshly fetched page of `rows` after the others."""
+        self._exhausted = len(rows) < self.page
+        if not rows:
+            return
+        self._after = len(self._rows) + len(rows) if self.ranked else rows[-1][2]
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(rows) - 1)
+        self._rows.extend(_cells(row) for row in rows)
+        self.endInsertRows()
+
+
+def _cells(row: tuple) -> tuple[int, QIcon | None, tuple[str, ...]]:
+    """Turn an `entries` row into a model one, with the secret swapped for a mask."""
+    icon_id, group_name, secret_id, name, secret, login, website, last_access = row
+    icon = getattr(Icons, icon_id, Icons.key) if icon_id and group_name else None
+    # Sealed secrets don't give their length away.
+    mask = SEALED_MASK if isinstance(secret, bytes) else "*" * len(secret or "")
+    values = (group_name if icon else None, name, mask, login, website, last_access)
+    return secret_id, icon, tuple("" if value is None else str(value) for value in values)
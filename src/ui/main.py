@@ -1,31 +1,50 @@
 """The main window spawn class and load up of Greeting or Table classes."""
 
+from __future__ import annotations
+
 from contextlib import suppress
+from typing import ClassVar
 
-from PyQt6.QtCore import QSettings, QUrl, pyqtSignal
+from PyQt6.QtCore import QSettings, QSignalBlocker, QThreadPool, QUrl, pyqtSignal
 from PyQt6.QtGui import QAction, QDesktopServices
-from PyQt6.QtWidgets import QDialog, QFileDialog, QMainWindow, QMenu, QMessageBox
+from PyQt6.QtWidgets import (
+    QDialog,
+    QFileDialog,
+    QMainWindow,
+    QMenu,
+    QMessageBox,
+    QStatusBar,
+)
 from PyQt6.uic.load_ui import loadUi
 
-from ..errors import IncorrectError
-from ..models.cryptid import bytes_to_file, file_to_bytes
+from ..errors import IncorrectError, OutdatedError
+from ..models.cryptid import Session
 from ..models.customs import dump_to_file, restore_from_file
 from ..models.db import Glue
 from ..resources import ui_path
 from ..utils.logger import error, info
 from .about import AboutDialog
+from .autosave import Autosaver
 from .creation import CreationDialog
 from .greetings import GreetingsWidget
 from .icons import Icons
 from .settings import SettingDialog
 from .table import SecretsWidget
 from .unlocking import UnlockingDialog
+from .workers import Task
 
 
 class MainWindow(QMainWindow):
     """The main application window. Without a nested widget, it only provides the menu bar."""
 
     external_update = pyqtSignal()
+    # Emitted with the new revision whenever the open DB changes, from any thread.
+    db_changed = pyqtSignal(int)
+    # Emitted with the kind of change and IDs of entries affected, see `Glue.on_entries`.
+    entries_changed = pyqtSignal(str, object)
+
+    # Extra windows spawned to hold more vaults, kept alive until closed.
+    _windows: ClassVar[set[MainWindow]] = set()
 
     def __init__(self) -> None:
         """Spawn the MainWindow."""
@@ -35,14 +54,22 @@ class MainWindow(QMainWindow):
         self.setWindowIcon(Icons.app)
         self.setWindowTitle(self.tr("Lock And Key"))
         self.glue: Glue | None = None
-        self.cred: tuple[str, str] | None = None
+        self.session: Session | None = None
+        self._saving: tuple[Task, Glue, int] | None = None
+        self._save_queued = False
+        # Saves get a thread of their own, so waiting for one doesn't wait for anything else.
+        self._writer = QThreadPool(self)
+        self._writer.setMaxThreadCount(1)
 
         self.settings = QSettings("VIDEVSYS", "lockandkey")
+        self.autosaver = Autosaver(self.save_db, 2000, 30000, self)
+        self.db_changed.connect(self.autosaver.poke)
 
         self.menuDatabase: QMenu
         self.menuEntry: QMenu
         self.menuGroup: QMenu
         self.menuAbout: QMenu
+        self.statusbar: QStatusBar
 
         self.actionCreate_database: QAction
         self.actionSave_database: QAction
@@ -50,6 +77,7 @@ class MainWindow(QMainWindow):
         self.actionLock_database: QAction
         self.actionDump: QAction
         self.actionRestore: QAction
+        self.actionSeal_secrets: QAction
 
         self.actionCreate_entry: QAction
         self.actionEdit_entry: QAction
@@ -74,6 +102,7 @@ class MainWindow(QMainWindow):
         self.actionSave_database.triggered.connect(self.save_db)
         self.actionDump.triggered.connect(self.dump_db)
         self.actionRestore.triggered.connect(self.restore_db)
+        self.actionSeal_secrets.toggled.connect(self.seal_secrets)
 
         self.actionDocs.triggered.connect(
             lambda: QDesktopServices.openUrl(QUrl("https://github.com/vladzodchey/lockandkey"))
@@ -82,11 +111,10 @@ class MainWindow(QMainWindow):
         self.actionInfo.triggered.connect(lambda: AboutDialog().exec())
 
     def open_db(self, path: str | None = None) -> None:
-        """Open a database file."""
-        if path is not None:
-            self.unlock_lak(path)
-        else:
-            path, t = QFileDialog.getOpenFileName(
+        """Open a database file. If one is already open here, the new one gets its own window."""
+        kind = "Lock and Key vault (*.lak)"
+        if path is None:
+            path, kind = QFileDialog.getOpenFileName(
                 self,
                 "Select a database...",
                 "",
@@ -94,12 +122,23 @@ class MainWindow(QMainWindow):
             )
             if not path:
                 return
-            match t:
-                case "Bare DB (*.db, *.sqlite)":
-                    self.glue = Glue.from_bare(path)
-                    self.reveal_secrets()
-                case "Lock and Key vault (*.lak)":
-                    self.unlock_lak(path)
+        target = self
+        if self.glue is not None:
+            target = MainWindow()
+            MainWindow._windows.add(target)
+            target.show()
+        match kind:
+            case "Bare DB (*.db, *.sqlite)":
+                try:
+                    target.glue = Glue.from_bare(path)
+                except (IncorrectError, OutdatedError) as e:
+                    error(f"Can't open {path}: {e}")
+                else:
+                    target.reveal_secrets()
+            case "Lock and Key vault (*.lak)":
+                target.unlock_lak(path)
+        if target.glue is None and target is not self:
+            target.close()
 
     def unlock_lak(self, path: str):
         """Prompts the user to unlock LaK's encrypted DB.
@@ -107,23 +146,11 @@ class MainWindow(QMainWindow):
         Args:
             path: The path to the file, `str`
         """
-
-        def check_password(password):
-            try:
-                data = file_to_bytes(path, password)
-                self.glue = Glue.from_bytes(data)
-                self.cred = (path, password)  # DO NOT DO THIS! My deadline is burning, yours don't.
-                self.update_title()
-                modal.accept()
-            except IncorrectError:
-                modal.wrong()
-            except ValueError:
-                error("Bad DB file. Your data may be corrupted.")
-                modal.close()
-
         modal = UnlockingDialog(path)
-        modal.check.connect(lambda password: check_password(password))
+        modal.check.connect(lambda password: modal.run(Task(_open_vault, path, password)))
         if modal.exec() == QDialog.DialogCode.Accepted:
+            self.session, self.glue = modal.outcome
+            self.update_title()
             self.reveal_secrets()
 
     def new_db(self) -> None:
@@ -136,27 +163,43 @@ class MainWindow(QMainWindow):
 
     def reveal_secrets(self) -> None:
         """Change the greet widget to a secrets table widget and populate it."""
+        if self.glue is not None:
+            self.glue.on_change = self.db_changed.emit
+            self.glue.on_entries = self.entries_changed.emit
+            if self.settings.value("profile", False, bool):
+                self.glue.instrument(self.settings.value("slow_query_ms", 50.0, float))
         secrets = SecretsWidget(self)
         secrets.changed.connect(self._update_save_state)
-        self.external_update.connect(secrets.display)
         self.external_update.connect(secrets.update_groups)
+        self.entries_changed.connect(secrets.apply_change)
         self.actionLock_database.setEnabled(True)
         self.actionDump.setEnabled(True)
         self.actionRestore.setEnabled(True)
+        with QSignalBlocker(self.actionSeal_secrets):
+            self.actionSeal_secrets.setEnabled(self.session is not None)
+            self.actionSeal_secrets.setChecked(self.glue is not None and self.glue.sealed)
         self.menuEntry.setEnabled(True)
         self.menuGroup.setEnabled(True)
         self.setCentralWidget(secrets)
+        if self.glue is not None:
+            # Built ahead of the first search, which would wait for it otherwise.
+            Task(self.glue.fuzzy_index).start()
 
     def greet(self) -> None:
         """Change the secrets table widget/empty widget to a greet widget."""
         greeting = GreetingsWidget(self)
         with suppress(TypeError):
             self.external_update.disconnect()
+        with suppress(TypeError):
+            self.entries_changed.disconnect()
         self.setCentralWidget(greeting)
         self.actionSave_database.setEnabled(False)
         self.actionLock_database.setEnabled(False)
         self.actionRestore.setEnabled(False)
         self.actionDump.setEnabled(False)
+        with QSignalBlocker(self.actionSeal_secrets):
+            self.actionSeal_secrets.setEnabled(False)
+            self.actionSeal_secrets.setChecked(False)
         self.menuEntry.setEnabled(False)
         self.menuGroup.setEnabled(False)
 
@@ -167,20 +210,81 @@ class MainWindow(QMainWindow):
         self.get_settings()
 
     def save_db(self) -> None:
-        """Saves the database state back into its file."""
-        if self.glue is None or not self.cred:
+        """Saves the database state back into its file, encrypting and writing on a worker.
+
+        The DB is snapshotted right away, so edits made during the save are kept for the next
+        one. Saves requested while another one is in flight are coalesced into a single one
+        behind it, skipped if nothing changed by then. The vault file is replaced atomically,
+        see `Session.save`.
+        """
+        if self.glue is None or self.session is None:
+            return
+        self.autosaver.cancel()
+        if self._saving is not None:
+            self._save_queued = True
             return
-        bytes_to_file(self.cred[0], self.cred[1], self.glue.to_bytes())
-        self.glue.dirty = False
+        task = Task(self.session.save, self.glue.to_bytes())
+        self._saving = (task, self.glue, self.glue.revision)
+        task.signals.done.connect(self._finish_save)
+        task.signals.failed.connect(self._finish_save)
+        self.statusbar.showMessage(self.tr("Saving..."))
+        task.start(self._writer)
+
+    def _finish_save(self, *_) -> None:
+        if self._saving is None or not self._saving[0].finished:
+            return
+        task, glue, revision = self._saving
+        self._saving = None
+        if task.error is not None:
+            error(f"Failed to save the database: {task.error}")
+            self.statusbar.showMessage(self.tr("Saving failed!"))
+        else:
+            glue.mark_saved(revision)
+            self.statusbar.showMessage(self.tr("Saved."), 2000)
         self.update_title()
+        if self._save_queued:
+            self._save_queued = False
+            if self.glue is glue and glue.dirty:
+                self.save_db()
+
+    def _wait_for_save(self) -> None:
+        """Block until an in-flight save is done, dropping queued ones."""
+        if self._saving is None:
+            return
+        self._save_queued = False
+        self._writer.waitForDone()
+        self._finish_save()
+
+    def _save_now(self) -> bool:
+        """Save on the GUI thread, for when the app can't go on before the data is stored.
+
+        Returns:
+            Whether it's saved, failures are reported to the user and the vault is left open.
+        """
+        self.autosaver.cancel()
+        self._wait_for_save()
+        if self.glue is None or self.session is None:
+            return True
+        revision = self.glue.revision
+        try:
+            self.session.save(self.glue.to_bytes())
+        except OSError as e:
+            error(f"Failed to save the database: {e}")
+            self.statusbar.showMessage(self.tr("Saving failed!"))
+            QMessageBox.critical(self, self.tr("Saving failed!"), str(e))
+            return False
+        self.glue.mark_saved(revision)
+        self.update_title()
+        return True
 
     def lock_db(self) -> None:
         """Save data and log out of the current database."""
         if self.glue is not None:
-            self.save_db()
+            if not self._save_now():
+                return
             self.glue.close()
             self.glue = None
-        self.cred = None
+        self.session = None
         self.update_title()
         self.greet()
 
@@ -188,6 +292,7 @@ class MainWindow(QMainWindow):
         """Catches the close event, prompting saving before exiting."""
         if a0 is None:
             return
+        self._wait_for_save()
         if self.glue and self.glue.dirty:
             res = QMessageBox.question(
                 self,
@@ -201,12 +306,19 @@ class MainWindow(QMainWindow):
                 case QMessageBox.StandardButton.Discard:
                     a0.accept()
                 case QMessageBox.StandardButton.Save:
-                    self.save_db()
+                    if not self._save_now():
+                        a0.ignore()
+                        return
                     a0.accept()
                 case QMessageBox.StandardButton.Cancel:
                     a0.ignore()
-            return
-        a0.accept()
+                    return
+        else:
+            a0.accept()
+        if self.glue is not None:
+            self.glue.close()
+            self.glue = None
+        MainWindow._windows.discard(self)
 
     def _update_save_state(self) -> None:
         self.actionSave_database.setEnabled(True)
@@ -214,15 +326,20 @@ class MainWindow(QMainWindow):
 
     def update_title(self) -> None:
         """Updates the window title to display the DB path and dirtyness, if possible."""
-        if not self.cred or not self.glue:
+        if self.session is None or not self.glue:
             self.setWindowTitle(self.tr("Lock And Key"))
             return
-        self.setWindowTitle(f"{'* ' if self.glue.dirty else ''}{self.cred[0]}")
+        self.setWindowTitle(f"{'* ' if self.glue.dirty else ''}{self.session.path}")
 
     def get_settings(self) -> None:
         """Reloads settings."""
         self.do_clear = self.settings.value("clear", True, bool)
         self.clear_delay = self.settings.value("clear_delay", 15, int)
+        self.autosaver.configure(
+            self.settings.value("autosave", True, bool),
+            self.settings.value("autosave_delay", 2, int) * 1000,
+            self.settings.value("autosave_max", 30, int) * 1000,
+        )
 
     def dump_db(self) -> None:
         """Dumps the database to a file."""
@@ -241,6 +358,22 @@ class MainWindow(QMainWindow):
             self, self.tr("Success"), f"{self.tr('Dumped database to ')} {output}"
         )
 
+    def seal_secrets(self, checked: bool) -> None:
+        """Start or stop keeping each secret encrypted on its own, with a key kept in the vault.
+
+        Sealed secrets only get decrypted when they're asked for, one by one.
+        """
+        if self.glue is None or self.session is None:
+            return
+        self._wait_for_save()
+        if checked:
+            self.glue.seal_secrets(self.session.enable_records())
+        else:
+            self.glue.unseal_secrets()
+            self.session.record_key = None
+        self._update_save_state()
+        self.external_update.emit()
+
     def restore_db(self) -> None:
         """Prompt restoration from .csv file."""
         if self.glue is None:
@@ -257,3 +390,21 @@ class MainWindow(QMainWindow):
         QMessageBox.information(self, self.tr("Success"), f"{self.tr('Restored from ')} {inp}")
         self.external_update.emit()
         self._update_save_state()
+
+
+def _open_vault(path: str, password: str) -> tuple[Session, Glue]:
+    """Unlock the vault at `path` and spawn a Glue on it. Meant for a worker thread.
+
+    Raises:
+        IncorrectError: The password is wrong.
+        ValueError: The file isn't a Lock and Key vault, or is damaged.
+        OutdatedError: The vault was made by a newer version of the app.
+    """
+    session, data = Session.unlock(path, password)
+    try:
+        glue = Glue.from_bytes(data)
+    except IncorrectError as e:
+        raise ValueError(str(e)) from e
+    if session.record_key is not None:
+        glue.seal_secrets(session.record_key)
+    return session, glue
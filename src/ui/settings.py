@@ -19,6 +19,10 @@ class SettingDialog(QDialog):
         self.clearCheck: QCheckBox
         self.buttonBox: QDialogButtonBox
         self.langCombo: QComboBox
+        self.unlockTimeSpin: QSpinBox
+        self.autosaveCheck: QCheckBox
+        self.autosaveDelaySpin: QSpinBox
+        self.autosaveMaxSpin: QSpinBox
 
         self.buttonBox.clicked.connect(lambda button: self.apply(button))
 
@@ -26,10 +30,21 @@ class SettingDialog(QDialog):
 
         self.clearDelaySpin.setValue(self.settings.value("clear_delay", 15, int))
         self.clearCheck.setChecked(self.settings.value("clear", True, bool))
+        self.unlockTimeSpin.setValue(self.settings.value("unlock_ms", 500, int))
+        self.autosaveCheck.setChecked(self.settings.value("autosave", True, bool))
+        self.autosaveDelaySpin.setValue(self.settings.value("autosave_delay", 2, int))
+        self.autosaveMaxSpin.setValue(self.settings.value("autosave_max", 30, int))
+        self._toggle_autosave()
 
         self.clearCheck.checkStateChanged.connect(
             lambda: self.clearDelaySpin.setEnabled(self.clearCheck.isChecked())
         )
+        self.autosaveCheck.checkStateChanged.connect(self._toggle_autosave)
+
+    def _toggle_autosave(self) -> None:
+        enabled = self.autosaveCheck.isChecked()
+        self.autosaveDelaySpin.setEnabled(enabled)
+        self.autosaveMaxSpin.setEnabled(enabled)
 
     def apply(self, button) -> None:
         """Saves the settings."""
@@ -40,7 +55,15 @@ class SettingDialog(QDialog):
                 language = self.langCombo.currentText()[-3:-1].lower()
                 do_clear = self.clearCheck.isChecked()
                 clear_delay = self.clearDelaySpin.value()
+                unlock_ms = self.unlockTimeSpin.value()
+                autosave = self.autosaveCheck.isChecked()
+                autosave_delay = self.autosaveDelaySpin.value()
+                autosave_max = self.autosaveMaxSpin.value()
                 self.settings.setValue("language", language)
                 self.settings.setValue("clear", do_clear)
                 self.settings.setValue("clear_delay", clear_delay)
+                self.settings.setValue("unlock_ms", unlock_ms)
+                self.settings.setValue("autosave", autosave)
+                self.settings.setValue("autosave_delay", autosave_delay)
+                self.settings.setValue("autosave_max", autosave_max)
                 self.accept()
@@ -2,7 +2,7 @@
 
 from contextlib import suppress
 
-from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtCore import QSignalBlocker, Qt, QThreadPool, QTimer, pyqtSignal
 from PyQt6.QtGui import QIcon, QKeySequence, QShortcut
 from PyQt6.QtWidgets import (
     QApplication,
@@ -14,8 +14,7 @@ from PyQt6.QtWidgets import (
     QMessageBox,
     QProgressBar,
     QPushButton,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
     QWidget,
 )
 from PyQt6.uic.load_ui import loadUi
@@ -23,13 +22,17 @@ from PyQt6.uic.load_ui import loadUi
 from src.ui.group import GroupingDialog
 from src.ui.qr import ShareQRDialog
 
-from ..models.db import Glue
+from ..models.db import RESET, Glue
 from ..resources import ui_path
-from ..utils.logger import info
+from ..utils.logger import error, info
 from .entry import EnterDialog
 from .generation import GenerateDialog
 from .icons import Icons
-from .settings import SettingDialog
+from .listing import EntriesModel
+from .workers import Task
+
+# How long typing has to pause for the search to start, in milliseconds.
+SEARCH_DELAY_MS = 250
 
 
 class SecretsWidget(QWidget):
@@ -48,7 +51,10 @@ class SecretsWidget(QWidget):
         self.root = root
         self.glue: Glue = self.root.glue
 
-        self.secretsTable: QTableWidget
+        self.secretsTable: QTableView
+        self.model = EntriesModel(self)
+        self.secretsTable.setModel(self.model)
+        self._set_up_header()
 
         self.openDbButton: QPushButton
         self.saveDbButton: QPushButton
@@ -79,8 +85,14 @@ class SecretsWidget(QWidget):
         self.progress_timer = QTimer(self)
         self.progress_timer.timeout.connect(self._update_progress)
         self.clipboard = QApplication.clipboard()
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.search)
+        self._search: Task | None = None
+        self._searches = 0
 
-        self.secretsTable.currentCellChanged.connect(self.selected)
+        self.secretsTable.selectionModel().currentChanged.connect(self.selected)
 
         self.openDbButton.clicked.connect(lambda: self.root.open_db())
         self.saveDbButton.clicked.connect(self._save)
@@ -96,8 +108,6 @@ class SecretsWidget(QWidget):
         self._set_up_buttons()
 
         self.update_groups()
-        self.groupCombo.setCurrentIndex(0)
-        self.display()
 
     def _set_up_buttons(self) -> None:
         self.addEntryButton.clicked.connect(self.new_entry)
@@ -106,8 +116,9 @@ class SecretsWidget(QWidget):
 
         self.searchButton.clicked.connect(self.search)
         self.searchEdit.returnPressed.connect(self.search)
+        self.searchEdit.textChanged.connect(self._typed)
         self.keyButton.clicked.connect(lambda: GenerateDialog().exec())
-        self.settingsButton.clicked.connect(lambda: SettingDialog().exec())
+        self.settingsButton.clicked.connect(lambda: self.root.set_settings())
 
         self.root.actionCreate_entry.setEnabled(True)
         self.root.actionCreate_entry.triggered.connect(self.new_entry)
@@ -119,57 +130,56 @@ class SecretsWidget(QWidget):
         self.root.actionEdit_group.triggered.connect(self.edit_group)
         self.root.actionDelete_group.triggered.connect(self.delete_group)
 
+    def _set_up_header(self) -> None:
+        # Sized to the first page once, sizing to contents on every fetch would go over all rows.
+        header = self.secretsTable.horizontalHeader()
+        if header:
+            header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+            header.setStretchLastSection(True)
+            header.setResizeContentsPrecision(50)
+        vertical = self.secretsTable.verticalHeader()
+        if vertical:
+            vertical.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+
     def display(self, query: str | None = None) -> None:
-        """Load values in to the table."""
-        self.secretsTable.clear()
+        """Load values in to the table, a page at a time as it's scrolled.
+
+        Queries are searched for on a worker, see `search`. Without one, the first page is
+        loaded right away, and searches still running are left unshown.
+        """
         self.secretsTable.setContextMenuPolicy(Qt.ContextMenuPolicy.NoContextMenu)
-        self.secretsTable.setColumnCount(6)
-        self.secretsTable.setHorizontalHeaderLabels(
-            (
-                self.tr("Group"),
-                self.tr("Name"),
-                self.tr("Secret"),
-                self.tr("Login"),
-                self.tr("Website"),
-                self.tr("Last accessed"),
-            )
-        )
-        if self.glue is None:
+        if query:
+            if self.searchEdit.text() != query:
+                with QSignalBlocker(self.searchEdit):
+                    self.searchEdit.setText(query)
+            self.search()
             return
-        group = self.groupCombo.currentData()
-        if group == "all":
-            group = None
-        values = self.glue.entries(text=query, group=group)
-        if not values:
-            self.secretsTable.setRowCount(0)
-            return
-        self.secretsTable.setRowCount(len(values))
-        for x, row in enumerate(values):
-            icon_id, group_name, secret_id, name, secret, login, website, last_access = row
-            if icon_id and group_name:
-                group_item = QTableWidgetItem(getattr(Icons, icon_id, Icons.key), str(group_name))
-                self.secretsTable.setItem(x, 0, group_item)
-
-            name_item = QTableWidgetItem(name)
-            name_item.setData(Qt.ItemDataRole.UserRole, secret_id)
-            self.secretsTable.setItem(x, 1, name_item)
-            secret_item = QTableWidgetItem("*" * len(secret))
-            secret_item.setData(Qt.ItemDataRole.UserRole, secret)
-            self.secretsTable.setItem(x, 2, secret_item)
-            self.secretsTable.setItem(x, 3, QTableWidgetItem(str(login)))
-            self.secretsTable.setItem(x, 4, QTableWidgetItem(str(website)))
-            self.secretsTable.setItem(x, 5, QTableWidgetItem(str(last_access)))
+        self._drop_search()
+        self.model.load(self.glue, group=self._group())
         self.secretsTable.resizeColumnsToContents()
-        self.secretsTable.resizeColumnToContents(-1)
-        header = self.secretsTable.horizontalHeader()
-        for i in range(self.secretsTable.columnCount()):
-            mode = (
-                QHeaderView.ResizeMode.Stretch
-                if i == self.secretsTable.columnCount() - 1
-                else QHeaderView.ResizeMode.ResizeToContents
-            )
-            if header:
-                header.setSectionResizeMode(i, mode)
+        self.selected()
+
+    def apply_change(self, kind: str, identifiers: tuple[int, ...]) -> None:
+        """Update just the rows an entry change affected, see `EntriesModel.apply`.
+
+        Search results are searched for over on a worker if the fuzzy index has to be rebuilt.
+        """
+        if self.model.ranked and (kind == RESET or not self.glue.fuzzy_ready):
+            self.search()
+            return
+        index = self.secretsTable.currentIndex()
+        current = self.get_id()
+        scrollbar = self.secretsTable.verticalScrollBar()
+        scrolled = scrollbar.value() if scrollbar else 0
+        self.model.apply(kind, identifiers)
+        if kind == RESET or self.model.ranked:
+            # Reloads drop the selection, so it's put back on the same entry, if it's still there.
+            row = None if current is None else self.model.row_of(current)
+            if row is not None:
+                self.secretsTable.setCurrentIndex(self.model.index(row, max(index.column(), 0)))
+            if scrollbar:
+                scrollbar.setValue(scrolled)
+        self.selected()
 
     def selected(self) -> None:
         """Handles cells being selected."""
@@ -185,10 +195,8 @@ class SecretsWidget(QWidget):
         self.deleteEntryButton.setEnabled(True)
         self.root.actionEdit_entry.setEnabled(True)
         self.root.actionDelete_entry.setEnabled(True)
-        res = self.glue.get_entry(i)
-        if not res:
-            return
-        website = res[3]
+        # Taken from the table, as `get_entry` would open a sealed secret for nothing.
+        website = self.model.index(self.secretsTable.currentIndex().row(), 4).data()
         if not website:
             self.shareButton.setEnabled(False)
             return
@@ -205,16 +213,10 @@ class SecretsWidget(QWidget):
         """
         if self.glue is None:
             return None
-        row = self.secretsTable.currentRow()
-        if row == -1:
-            return None
-        item = self.secretsTable.item(row, 1)
-        if item is None:
-            return None
-        try:
-            return int(item.data(Qt.ItemDataRole.UserRole))
-        except ValueError:
+        index = self.secretsTable.currentIndex()
+        if not index.isValid():
             return None
+        return self.model.entry_id(index.row())
 
     def new_entry(self) -> None:
         """Prompts the new entry creation."""
@@ -222,7 +224,6 @@ class SecretsWidget(QWidget):
             return
         dialog = EnterDialog(self.glue)
         if dialog.exec() == QDialog.DialogCode.Accepted:
-            self.display()
             self.changed.emit()
 
     def edit_entry(self) -> None:
@@ -233,7 +234,6 @@ class SecretsWidget(QWidget):
 
         dialog = EnterDialog(self.glue, i)
         if dialog.exec() == QDialog.DialogCode.Accepted:
-            self.display()
             self.changed.emit()
 
     def delete_entry(self) -> None:
@@ -246,7 +246,6 @@ class SecretsWidget(QWidget):
         )
         if res == QMessageBox.StandardButton.Yes:
             self.glue.delete_entry(i)
-            self.display()
             self.changed.emit()
 
     def _save(self) -> None:
@@ -259,9 +258,54 @@ class SecretsWidget(QWidget):
         dialog.exec()
 
     def search(self) -> None:
-        """Performs a search for entries with a name similar to query."""
-        query = self.searchEdit.text()
-        self.display(query)
+        """Performs a search for entries roughly matching the query by name, login or website.
+
+        Results are ranked best first, typos tolerated, see `Glue.find`.
+        The first page of results is fetched on a worker. Only the newest search gets shown:
+        older ones still queued are dropped, and results of ones already running are ignored.
+        """
+        if self.glue is None:
+            return
+        self._drop_search()
+        query = self.searchEdit.text() or None
+        task = Task(_search, self.glue, self._searches, query, self._group(), self.model.page)
+        task.signals.done.connect(self._show_results)
+        task.signals.failed.connect(self._search_failed)
+        self._search = task
+        task.start()
+
+    def _drop_search(self) -> None:
+        """Leave the latest search unshown, taking it off the queue if it hasn't started."""
+        self.search_timer.stop()
+        if self._search is not None and not self._search.finished:
+            # It may finish and get deleted by the pool meanwhile, then there's nothing to drop.
+            with suppress(RuntimeError):
+                QThreadPool.globalInstance().tryTake(self._search)
+        self._search = None
+        self._searches += 1
+
+    def _typed(self, _: str) -> None:
+        self.search_timer.start()
+
+    def _show_results(self, outcome: tuple[int, str | None, int | None, list[tuple]]) -> None:
+        number, query, group, rows = outcome
+        if number != self._searches:
+            return
+        self._search = None
+        current = self.get_id()
+        self.model.load(self.glue, text=query, group=group, first_page=rows)
+        row = None if current is None else self.model.row_of(current)
+        if row is not None:
+            self.secretsTable.setCurrentIndex(self.model.index(row, 1))
+        self.selected()
+
+    def _search_failed(self, e: Exception) -> None:
+        error(f"Search failed: {e}")
+
+    def _group(self) -> int | None:
+        """The ID of the group selected to filter by, if any."""
+        group = self.groupCombo.currentData()
+        return group if isinstance(group, int) else None
 
     def new_group(self) -> None:
         """Prompts group creation."""
@@ -293,21 +337,29 @@ class SecretsWidget(QWidget):
             )
             if res == QMessageBox.StandardButton.Yes:
                 self.glue.delete_group(group)
-                self.display()
                 self.update_groups()
                 self.changed.emit()
 
     def update_groups(self) -> None:
-        """Populates the group combo box with data."""
+        """Populates the group combo box with data, keeping the selected group if it's still there.
+
+        The table is only reloaded if the selection had to change.
+        """
         if self.glue is None:
             return
         groups = self.glue.groups()
-        self.groupCombo.clear()
-        self.groupCombo.addItem(Icons.all, self.tr("All"), "all")
-        for i, name, icon in groups:
-            if icon:
-                self.groupCombo.addItem(QIcon(getattr(Icons, icon)), name, i)
-        self.groupCombo.addItem(Icons.add, self.tr("New group..."), "new")
+        current = self.groupCombo.currentData()
+        with QSignalBlocker(self.groupCombo):
+            self.groupCombo.clear()
+            self.groupCombo.addItem(Icons.all, self.tr("All"), "all")
+            for i, name, icon in groups:
+                if icon:
+                    self.groupCombo.addItem(QIcon(getattr(Icons, icon)), name, i)
+            self.groupCombo.addItem(Icons.add, self.tr("New group..."), "new")
+            if isinstance(current, int):
+                self.groupCombo.setCurrentIndex(max(self.groupCombo.findData(current), 0))
+        if self.groupCombo.currentData() != current:
+            self.select_group(self.groupCombo.currentIndex())
 
     def select_group(self, i: int) -> None:
         """Handles group being re-selected."""
@@ -320,20 +372,22 @@ class SecretsWidget(QWidget):
             case _:
                 self.root.actionEdit_group.setEnabled(True)
                 self.root.actionDelete_group.setEnabled(True)
-        self.display()
+        self.display(self.searchEdit.text() or None)
 
     def _copy_from_table(self) -> None:
         if self.clipboard is None:
             return
-        column = self.secretsTable.currentColumn()
-        item = self.secretsTable.currentItem()
-        if item is None:
+        index = self.secretsTable.currentIndex()
+        if not index.isValid():
             return
-        if column != 2:  # noqa: PLR2004
+        if index.column() != 2:  # noqa: PLR2004
             self._clear_clipboard()
-            self.clipboard.setText(item.text())
+            self.clipboard.setText(index.data())
+            return
+        i = self.get_id()
+        value = None if i is None else self.glue.secret(i)
+        if value is None:
             return
-        value = item.data(Qt.ItemDataRole.UserRole)
         self.clipboard.setText(value)
         if self.root.do_clear:
             self.clipboardFrame.show()
@@ -353,3 +407,16 @@ class SecretsWidget(QWidget):
 
     def _update_progress(self) -> None:
         self.clipboardProgress.setValue(max(0, self.clipboardProgress.value() - 1))
+
+
+def _search(
+    glue: Glue, number: int, query: str | None, group: int | None, page: int
+) -> tuple[int, str | None, int | None, list[tuple]]:
+    """Fetch the first `page` of entries matching `query` in `group`. Meant for a worker thread.
+
+    Returns:
+        The `number` of the search, `query`, `group` and the entries, to tell searches apart.
+    """
+    if query:
+        return number, query, group, glue.find(query, group=group, limit=page)
+    return number, query, group, glue.entries_page(0, page, group=group)
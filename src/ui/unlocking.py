@@ -1,11 +1,16 @@
 """This module provides the password prompt modal."""
 
+from typing import Any
+
 from PyQt6.QtCore import pyqtSignal
 from PyQt6.QtWidgets import QDialog, QLineEdit
 from PyQt6.uic.load_ui import loadUi
 
+from ..errors import IncorrectError
 from ..resources import ui_path
+from ..utils.logger import error
 from .icons import Icons
+from .workers import Task
 
 
 class UnlockingDialog(QDialog):
@@ -29,6 +34,9 @@ class UnlockingDialog(QDialog):
         self.buttonBox.rejected.connect(self.reject)
         self.buttonBox.accepted.connect(self._on_check_clicked)
 
+        self.outcome: Any = None
+        self._task: Task | None = None
+
     def _hide_n_seek(self) -> None:
         if self.passwordEdit.echoMode() == QLineEdit.EchoMode.Normal:
             self.passwordEdit.setEchoMode(QLineEdit.EchoMode.Password)
@@ -44,3 +52,39 @@ class UnlockingDialog(QDialog):
     def wrong(self) -> None:
         """Tell the user that something is wrong."""
         self.errorLabel.setText(self.tr("The key doesn't fit."))
+
+    def run(self, task: Task) -> None:
+        """Unlock on a worker thread, keeping the dialog busy until `task` is done.
+
+        On success, the result of `task` is stored in `outcome` and the dialog is accepted.
+        An `IncorrectError` lets the user try again, anything else rejects the dialog.
+        """
+        self._task = task
+        self._set_busy(True)
+        task.signals.done.connect(self._unlocked)
+        task.signals.failed.connect(self._failed)
+        task.start()
+
+    def reject(self) -> None:
+        """Closes the dialog, unless it's busy unlocking."""
+        if self._task is None:
+            super().reject()
+
+    def _set_busy(self, busy: bool) -> None:
+        self.passwordEdit.setEnabled(not busy)
+        self.buttonBox.setEnabled(not busy)
+        self.errorLabel.setText(self.tr("Unlocking...") if busy else "")
+
+    def _unlocked(self, outcome: Any) -> None:
+        self._task = None
+        self.outcome = outcome
+        self.accept()
+
+    def _failed(self, e: Exception) -> None:
+        self._task = None
+        self._set_busy(False)
+        if isinstance(e, IncorrectError):
+            self.wrong()
+            return
+        error(f"Can't open {self.pathLabel.text()}: {e}")
+        self.reject()
@@ -0,0 +1,55 @@
+"""This module provides a way to run heavy work off the GUI thread."""
+
+from collections.abc import Callable
+from typing import Any
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class TaskSignals(QObject):
+    """Signals of a `Task`, delivered to the GUI thread."""
+
+    done = pyqtSignal(object)
+    failed = pyqtSignal(Exception)
+
+
+class Task(QRunnable):
+    """Runs a function on the global thread pool, reporting the outcome through `signals`.
+
+    Connect to `signals` with bound methods of `QObject`s, so they get called in their thread.
+    """
+
+    def __init__(self, fn: Callable[..., Any], *args: Any):
+        """Wrap `fn` to be called with `args` on a worker thread.
+
+        Args:
+            fn: The function to run
+            args: Positional arguments to pass to `fn`
+        """
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.signals = TaskSignals()
+        self.finished = False
+        self.result: Any = None
+        self.error: Exception | None = None
+
+    def run(self) -> None:
+        """Call the function, emitting `done` with its result or `failed` with its exception.
+
+        The outcome is also stored in `result` or `error` before `finished` is set,
+        for those who'd rather wait for the pool than for the signal.
+        """
+        try:
+            self.result = self.fn(*self.args)
+        except Exception as e:
+            self.error = e
+        self.finished = True
+        if self.error is not None:
+            self.signals.failed.emit(self.error)
+        else:
+            self.signals.done.emit(self.result)
+
+    def start(self, pool: QThreadPool | None = None) -> None:
+        """Queue the task on the `pool`, the global thread pool if not given."""
+        (pool or QThreadPool.globalInstance()).start(self)
@@ -0,0 +1,334 @@
+from base64 import b64encode
+from json import loads
+from os import urandom
+from time import sleep
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from ..src.errors import IncorrectError, OutdatedError
+from ..src.models import cryptid, kdf
+from ..src.models.cryptid import Session, bytes_to_file, file_to_bytes
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cheap_kdf(monkeypatch):
+    monkeypatch.setattr(cryptid, "KDF_ITERATIONS", 1_000)
+    monkeypatch.setattr(kdf, "default", lambda: {"name": "pbkdf2", "iterations": 1_000})
+
+
+@pytest.fixture
+def vault(tmp_path):
+    return tmp_path / "vault.lak"
+
+
+class TestCryptid:
+    def test_roundtrip(self, vault):
+        bytes_to_file(vault, "hunter2", b"secret stuff")
+        assert file_to_bytes(vault, "hunter2") == b"secret stuff"
+
+    def test_wrong_password(self, vault):
+        bytes_to_file(vault, "hunter2", b"secret stuff")
+        with pytest.raises(IncorrectError):
+            file_to_bytes(vault, "hunter3")
+
+
+class TestSession:
+    def test_saves_reuse_key(self, vault, monkeypatch):
+        bytes_to_file(vault, "hunter2", b"first")
+        session, data = Session.unlock(vault, "hunter2")
+        assert data == b"first"
+        calls = []
+        derive = kdf.derive
+        monkeypatch.setattr(kdf, "derive", lambda *args: calls.append(args) or derive(*args))
+        session.save(b"second")
+        session.save(b"third")
+        assert not calls
+        assert file_to_bytes(vault, "hunter2") == b"third"
+
+    def test_fresh_iv_per_save(self, vault):
+        session = Session.create(vault, "hunter2")
+        session.save(b"same")
+        first = vault.read_bytes()
+        session.save(b"same")
+        assert vault.read_bytes() != first
+
+    def test_fresh_segment_key_per_save(self, vault, monkeypatch):
+        keys = []
+        derive = cryptid._segment_key
+        monkeypatch.setattr(cryptid, "_segment_key", lambda *args: keys.append(derive(*args)) or keys[-1])
+        session = Session.create(vault, "hunter2")
+        session.save(b"same")
+        salt = _header(vault)["keysalt"]
+        session.save(b"same")
+        assert _header(vault)["keysalt"] != salt
+        assert len(bytes.fromhex(salt)) == cryptid.SALT_SIZE
+        assert keys[0] != keys[1]
+        assert file_to_bytes(vault, "hunter2") == b"same"
+
+    def test_failed_save_keeps_vault(self, vault, monkeypatch):
+        bytes_to_file(vault, "hunter2", b"old")
+        session, _ = Session.unlock(vault, "hunter2")
+
+        def crash(*args):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(cryptid, "_seal_segment", crash)
+        with pytest.raises(OSError, match="disk full"):
+            session.save(b"new")
+        assert file_to_bytes(vault, "hunter2") == b"old"
+        assert list(vault.parent.iterdir()) == [vault]
+
+    def test_save_keeps_permissions(self, vault):
+        bytes_to_file(vault, "hunter2", b"old")
+        vault.chmod(0o640)
+        bytes_to_file(vault, "hunter2", b"new")
+        assert vault.stat().st_mode & 0o777 == 0o640
+        assert list(vault.parent.iterdir()) == [vault]
+
+    def test_save_through_symlink(self, vault, tmp_path):
+        target = tmp_path / "synced" / "vault.lak"
+        target.parent.mkdir()
+        vault.symlink_to(target)
+        bytes_to_file(vault, "hunter2", b"data")
+        assert vault.is_symlink()
+        assert file_to_bytes(target, "hunter2") == b"data"
+        assert list(tmp_path.glob("**/.*.tmp")) == []
+
+    def test_change_password(self, vault):
+        session = Session.create(vault, "hunter2")
+        session.change_password("correct horse")
+        session.save(b"data")
+        assert file_to_bytes(vault, "correct horse") == b"data"
+        with pytest.raises(IncorrectError):
+            file_to_bytes(vault, "hunter2")
+
+
+def _header(vault):
+    data = vault.read_bytes()
+    assert data.startswith(cryptid.MAGIC)
+    _, version, length = cryptid.PREAMBLE.unpack_from(data)
+    assert version == cryptid.VERSION
+    return loads(data[cryptid.PREAMBLE.size : cryptid.PREAMBLE.size + length])
+
+
+class TestHeader:
+    def test_records_kdf(self, vault):
+        bytes_to_file(vault, "hunter2", b"data")
+        header = _header(vault)
+        assert header["kdf"] == {"name": "pbkdf2", "iterations": 1_000}
+        assert len(bytes.fromhex(header["salt"])) == cryptid.SALT_SIZE
+
+    @pytest.mark.parametrize(
+        "spec",
+        [
+            {"name": "scrypt", "n": 2**10, "r": 8, "p": 1},
+            {"name": "argon2id", "iterations": 1, "lanes": 1, "memory": 64},
+        ],
+    )
+    def test_other_kdfs(self, vault, spec):
+        if spec["name"] not in kdf.available():
+            pytest.skip(f"{spec['name']} is unavailable")
+        Session.create(vault, "hunter2", spec).save(b"data")
+        assert _header(vault)["kdf"] == spec
+        assert file_to_bytes(vault, "hunter2") == b"data"
+
+    def test_damaged_header(self, vault):
+        bytes_to_file(vault, "hunter2", b"data")
+        data = bytearray(vault.read_bytes())
+        data[cryptid.PREAMBLE.size + 2] ^= 0x20  # `"kdf"` -> `"Kdf"`
+        vault.write_bytes(data)
+        with pytest.raises(ValueError, match="damaged"):
+            file_to_bytes(vault, "hunter2")
+
+    def test_newer_version(self, vault):
+        bytes_to_file(vault, "hunter2", b"data")
+        data = bytearray(vault.read_bytes())
+        data[len(cryptid.MAGIC)] = cryptid.VERSION + 1
+        vault.write_bytes(data)
+        with pytest.raises(OutdatedError):
+            file_to_bytes(vault, "hunter2")
+
+    def test_unknown_version(self, vault):
+        bytes_to_file(vault, "hunter2", b"data")
+        data = bytearray(vault.read_bytes())
+        data[len(cryptid.MAGIC)] = 0
+        vault.write_bytes(data)
+        with pytest.raises(ValueError, match="Unknown vault format"):
+            file_to_bytes(vault, "hunter2")
+
+    def test_legacy_vault(self, vault):
+        salt, iv = urandom(cryptid.SALT_SIZE), urandom(cryptid.IV_SIZE)
+        key = kdf.derive("hunter2", salt, {"name": "pbkdf2", "iterations": 1_000})
+        sealed = AESGCM(key).encrypt(iv, b"old data", None)
+        vault.write_bytes(b64encode(salt + iv + sealed[-16:] + sealed[:-16]))
+
+        session, data = Session.unlock(vault, "hunter2")
+        assert data == b"old data"
+        session.save(b"new data")
+        assert _header(vault)["kdf"]["name"] == "pbkdf2"
+        assert file_to_bytes(vault, "hunter2") == b"new data"
+
+    def test_compressed(self, vault):
+        payload = b"\0" * 64 * 1024
+        bytes_to_file(vault, "hunter2", payload)
+        assert _header(vault)["codec"] == "zstd"
+        assert vault.stat().st_size < len(payload) // 10
+        assert file_to_bytes(vault, "hunter2") == payload
+
+    def test_no_inflation(self, vault):
+        payload = urandom(64 * 1024)
+        bytes_to_file(vault, "hunter2", payload)
+        assert vault.stat().st_size < len(payload) + 320
+
+
+@pytest.fixture
+def segmented(vault, monkeypatch):
+    monkeypatch.setattr(cryptid, "SEGMENT_SIZE", 64)
+
+    def split():
+        data = vault.read_bytes()
+        _, _, length = cryptid.PREAMBLE.unpack_from(data)
+        start = cryptid.PREAMBLE.size + length
+        size = 64 + cryptid.TAG_SIZE
+        return data[:start], [data[i : i + size] for i in range(start, len(data), size)]
+
+    return split
+
+
+class TestSegments:
+    @pytest.mark.parametrize("length", [0, 1, 63, 64, 65, 64 * 4])
+    def test_roundtrip(self, vault, segmented, length):
+        payload = urandom(length)
+        bytes_to_file(vault, "hunter2", payload)
+        segments = segmented()[1]
+        # Random data doesn't compress, it only gains a frame header.
+        assert len(segments) >= max(1, -(-length // 64))
+        assert all(len(segment) == 64 + cryptid.TAG_SIZE for segment in segments[:-1])
+        assert file_to_bytes(vault, "hunter2") == payload
+
+    def test_wrong_password(self, vault, segmented):
+        bytes_to_file(vault, "hunter2", urandom(64 * 4))
+        with pytest.raises(IncorrectError):
+            file_to_bytes(vault, "hunter3")
+
+    def test_reordered(self, vault, segmented):
+        bytes_to_file(vault, "hunter2", urandom(64 * 4))
+        head, segments = segmented()
+        segments[1], segments[2] = segments[2], segments[1]
+        vault.write_bytes(head + b"".join(segments))
+        with pytest.raises(ValueError, match="segment 1"):
+            file_to_bytes(vault, "hunter2")
+
+    def test_cut_short(self, vault, segmented):
+        bytes_to_file(vault, "hunter2", urandom(64 * 4))
+        head, segments = segmented()
+        vault.write_bytes(head + b"".join(segments[:-1]))
+        with pytest.raises(ValueError, match=f"segment {len(segments) - 2}"):
+            file_to_bytes(vault, "hunter2")
+
+
+class TestZeroCopy:
+    def test_returns_buffer(self, vault):
+        bytes_to_file(vault, "hunter2", b"data")
+        assert isinstance(file_to_bytes(vault, "hunter2"), bytearray)
+
+    def test_saves_buffers(self, vault):
+        bytes_to_file(vault, "hunter2", memoryview(bytearray(b"data")))
+        assert file_to_bytes(vault, "hunter2") == b"data"
+
+    def test_empty_file(self, vault):
+        vault.write_bytes(b"")
+        with pytest.raises(ValueError, match="Not a"):
+            file_to_bytes(vault, "hunter2")
+
+    @pytest.mark.parametrize("sizes", [[], [10], [64], [64, 64], [30, 50, 70], [200, 1, 63]])
+    def test_resegment(self, sizes):
+        chunks = [urandom(size) for size in sizes]
+        pieces = list(cryptid._resegment(chunks, 64))
+        assert b"".join(bytes(piece) for piece, _ in pieces) == b"".join(chunks)
+        assert [last for _, last in pieces] == [False] * (len(pieces) - 1) + [True]
+        assert all(len(piece) == 64 for piece, _ in pieces[:-1])
+        assert len(pieces[-1][0]) or not sum(sizes)
+
+    def test_resegment_slices_whole_pieces(self):
+        data = urandom(64 * 3)
+        pieces = list(cryptid._resegment([data], 64))
+        assert all(isinstance(piece, memoryview) and piece.obj is data for piece, _ in pieces)
+
+
+class TestWorkers:
+    @pytest.mark.parametrize(("saving", "opening"), [(1, 4), (4, 1), (4, 4)])
+    def test_roundtrip(self, vault, segmented, saving, opening):
+        payload = urandom(64 * 20 + 5)
+        Session.create(vault, "hunter2", workers=saving).save(payload)
+        session, data = Session.unlock(vault, "hunter2", workers=opening)
+        assert data == payload
+        assert session.workers == opening
+
+    def test_ordered(self):
+        def slow(n):
+            sleep(0.001 * (n % 3))
+            return n * n
+
+        assert list(cryptid._ordered(slow, range(50), 4)) == [n * n for n in range(50)]
+
+    def test_damage_reported_in_order(self, vault, segmented):
+        Session.create(vault, "hunter2").save(urandom(64 * 20))
+        head, segments = segmented()
+        segments[5] = segments[5][:-1] + bytes([segments[5][-1] ^ 1])
+        segments[12] = segments[12][:-1] + bytes([segments[12][-1] ^ 1])
+        vault.write_bytes(head + b"".join(segments))
+        with pytest.raises(ValueError, match="segment 5"):
+            Session.unlock(vault, "hunter2", workers=4)
+
+
+class TestKeyCheck:
+    def test_recorded(self, vault):
+        bytes_to_file(vault, "hunter2", b"data")
+        assert len(bytes.fromhex(_header(vault)["check"])) == cryptid.CHECK_SIZE
+
+    def test_wrong_password_skips_body(self, vault, monkeypatch):
+        bytes_to_file(vault, "hunter2", urandom(1000))
+        monkeypatch.setattr(cryptid, "_decrypt", lambda *args: pytest.fail("body touched"))
+        with pytest.raises(IncorrectError):
+            file_to_bytes(vault, "hunter3")
+
+    def test_damaged_first_segment(self, vault, segmented):
+        bytes_to_file(vault, "hunter2", urandom(64 * 4))
+        head, segments = segmented()
+        segments[0] = bytes([segments[0][0] ^ 1]) + segments[0][1:]
+        vault.write_bytes(head + b"".join(segments))
+        with pytest.raises(ValueError, match="segment 0"):
+            file_to_bytes(vault, "hunter2")
+
+
+class TestRecordKey:
+    def test_absent_until_enabled(self, vault):
+        Session.create(vault, "hunter2").save(b"data")
+        assert "records" not in _header(vault)
+        session, _ = Session.unlock(vault, "hunter2")
+        assert session.record_key is None
+
+    def test_survives_password_change(self, vault):
+        session = Session.create(vault, "hunter2")
+        key = session.enable_records()
+        assert session.enable_records() == key
+        session.change_password("correct horse")
+        session.save(b"data")
+        reopened, data = Session.unlock(vault, "correct horse")
+        assert data == b"data"
+        assert reopened.record_key == key
+
+
+class TestCalibrate:
+    def test_respects_floors(self, monkeypatch):
+        monkeypatch.setattr(kdf, "_time", lambda spec: 10.0)
+        for name in kdf.available():
+            assert kdf.calibrate(name, target=0.1) == kdf.FLOORS[name]
+
+    def test_scales_up(self, monkeypatch):
+        monkeypatch.setattr(kdf, "_time", lambda spec: 0.1)
+        spec = kdf.calibrate("pbkdf2", target=1.0)
+        assert spec["iterations"] == kdf.FLOORS["pbkdf2"]["iterations"] * 10
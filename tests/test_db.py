@@ -0,0 +1,470 @@
+from random import Random
+from threading import Thread
+
+from ..src.errors import IncorrectError
+from ..src.models import db
+from ..src.models.db import DELETED, INSERTED, RESET, UPDATED, Glue
+from ..src.models.fuzzy import TrigramIndex, trigrams
+
+import pytest
+
+
+@pytest.fixture
+def glue():
+    instance = Glue.new()
+    yield instance
+    instance.close()
+
+
+class TestConnectionPool:
+    def test_connections_are_reused(self, glue):
+        for _ in range(10):
+            glue.entries()
+            glue.get_entry(1)
+        assert len(glue.pool._spawned) == 1
+
+    def test_readers_see_committed_writes(self, glue):
+        glue.add_entry("mail", "hunter2", "me")
+        assert glue.get_entry(1) == ("mail", "hunter2", "me", None, None)
+
+    def test_read_inside_write_sees_uncommitted(self, glue):
+        with glue.querying() as sql:
+            sql.query("INSERT INTO secrets (name, secret) VALUES ('a', 'b')", fetch=-1)
+            assert len(glue.entries()) == 1
+
+    def test_failed_write_rolls_back(self, glue):
+        with pytest.raises(ZeroDivisionError), glue.querying() as sql:
+            sql.query("INSERT INTO secrets (name, secret) VALUES ('a', 'b')", fetch=-1)
+            _ = 1 / 0
+        assert glue.entries() == []
+
+    def test_concurrent_reads(self, glue):
+        glue.add_entry("mail", "hunter2")
+        results = []
+        threads = [Thread(target=lambda: results.append(glue.entries())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(results) == 8
+        assert all(len(result) == 1 for result in results)
+        assert len(glue.pool._spawned) <= glue.pool.readers
+
+    def test_reads_during_write(self, glue):
+        glue.add_entry("mail", "hunter2")
+        results = []
+
+        def read():
+            results.append([row[3] for row in glue.entries()])
+
+        with pytest.raises(ZeroDivisionError), glue.querying() as sql:
+            sql.query("INSERT INTO secrets (name, secret) VALUES ('phantom', 'b')", fetch=-1)
+            reader = Thread(target=read)
+            reader.start()
+            reader.join(timeout=0.2)
+            assert reader.is_alive()  # Waiting for the write to end.
+            _ = 1 / 0
+        reader.join()
+        assert results == [["mail"]]
+
+    def test_readers_are_read_only(self, glue):
+        with pytest.raises(Exception, match="readonly"):
+            glue.query("DELETE FROM secrets", readonly=True)
+
+
+class TestSerialization:
+    def test_roundtrip(self, glue):
+        glue.add_entries([("a", "1"), ("b", "2")])
+        copy = Glue.from_bytes(glue.to_bytes())
+        assert copy.entries() == glue.entries()
+        copy.add_entry("c", "3")
+        assert Glue.from_bytes(copy.to_bytes()).get_entry(3) == ("c", "3", None, None, None)
+        copy.close()
+
+    def test_opened_image_is_private(self, glue):
+        copy = Glue.from_bytes(glue.to_bytes())
+        copy.add_entry("only here", "1")
+        assert glue.entries() == []
+        copy.close()
+
+    def test_new_vaults_are_isolated(self, glue):
+        other = Glue.new()
+        other.add_entry("only there", "1")
+        assert glue.entries() == []
+        assert len(other.entries()) == 1
+        other.close()
+
+    def test_garbage(self):
+        with pytest.raises(IncorrectError):
+            Glue.from_bytes(b"definitely not a database" * 200)
+
+
+class TestBulkEntries:
+    def test_add_returns_ids(self, glue):
+        glue.add_entry("first", "1")
+        ids = glue.add_entries([("a", "1"), ("b", "2", "login"), ("c", "3", None, "c.org")])
+        assert ids == [2, 3, 4]
+        assert glue.get_entry(3) == ("b", "2", "login", None, None)
+        assert glue.dirty
+
+    def test_add_nothing(self, glue):
+        assert glue.add_entries(iter(())) == []
+        assert not glue.dirty
+
+    def test_add_is_atomic(self, glue):
+        with pytest.raises(Exception, match="NOT NULL"):
+            glue.add_entries([("a", "1"), ("b", None)])
+        assert glue.entries() == []
+
+    def test_edit(self, glue):
+        ids = glue.add_entries([("a", "1"), ("b", "2")])
+        assert glue.edit_entries([(ids[0], "A", "x", "me"), (ids[1], "B", "y")]) == 2
+        assert glue.get_entry(ids[0]) == ("A", "x", "me", None, None)
+        assert glue.get_entry(ids[1]) == ("B", "y", None, None, None)
+
+    def test_delete(self, glue):
+        ids = glue.add_entries([("a", "1"), ("b", "2"), ("c", "3")])
+        assert glue.delete_entries(ids[:2]) == 2
+        assert [row[2] for row in glue.entries()] == ids[2:]
+
+
+class TestSearch:
+    def names(self, rows):
+        return [row[3] for row in rows]
+
+    def test_prefix_over_all_columns(self, glue):
+        glue.add_entries(
+            [
+                ("GitHub", "1", "octocat", "github.com"),
+                ("Mail", "2", "gitter", None),
+                ("Bank", "3", None, "bank.example"),
+            ]
+        )
+        assert sorted(self.names(glue.entries(text="git"))) == ["GitHub", "Mail"]
+        assert self.names(glue.entries(text="example")) == ["Bank"]
+        assert self.names(glue.entries(text="GitHub oct*")) == ["GitHub"]
+
+    def test_index_follows_changes(self, glue):
+        (i,) = glue.add_entries([("Old", "1")])
+        glue.edit_entry(i, "New", "1", None, None, None)
+        assert glue.entries(text="old") == []
+        assert self.names(glue.entries(text="new")) == ["New"]
+        glue.delete_entry(i)
+        assert glue.entries(text="new") == []
+
+    def test_replace_keeps_index_in_sync(self, glue):
+        glue.add_entry("Old", "1")
+        glue.query("INSERT OR REPLACE INTO secrets (secretId, name, secret) VALUES (1, 'New', '1')")
+        assert glue.entries(text="old") == []
+        assert self.names(glue.entries(text="new")) == ["New"]
+
+    def test_group_and_text(self, glue):
+        glue.add_group("work", "key")
+        glue.add_entries([("git work", "1", None, None, 1), ("git home", "2")])
+        assert self.names(glue.entries(text="git", group=1)) == ["git work"]
+
+    def test_punctuation_only_falls_back(self, glue):
+        glue.add_entry("*", "1")
+        assert self.names(glue.entries(text="*")) == ["*"]
+
+
+class TestPagination:
+    def test_pages_follow_ids(self, glue):
+        ids = glue.add_entries((f"entry {i}", "x") for i in range(25))
+        first = glue.entries_page(limit=10)
+        assert [row[2] for row in first] == ids[:10]
+        second = glue.entries_page(first[-1][2], 10)
+        assert [row[2] for row in second] == ids[10:20]
+        assert glue.entries_page(ids[-1], 10) == []
+
+    def test_iter_matches_entries(self, glue):
+        glue.add_entries((f"entry {i}", "x") for i in range(25))
+        assert list(glue.iter_entries(page=7)) == sorted(glue.entries(), key=lambda r: r[2])
+
+    def test_iter_with_search(self, glue):
+        glue.add_entries((f"{'odd' if i % 2 else 'even'} {i}", "x") for i in range(20))
+        rows = list(glue.iter_entries(text="odd", page=3))
+        assert [row[3] for row in rows] == [f"odd {i}" for i in range(1, 20, 2)]
+
+
+class TestInstrumentation:
+    def test_off_by_default(self, glue):
+        glue.entries()
+        assert glue.stats() == {}
+
+    def test_counts_statements(self, glue):
+        glue.instrument()
+        glue.add_entries([("a", "1"), ("b", "2")])
+        glue.entries()
+        glue.entries()
+        glue.get_entry(1)
+        statements = glue.stats()["statements"]
+        listing = next(
+            entry
+            for sql, entry in statements.items()
+            if "LEFT JOIN groups" in sql and "e.lastAccess" in sql
+        )
+        assert listing["count"] == 2
+        assert listing["rows"] == 4
+        assert sum(listing["histogram"]) == 2
+        insert = next(entry for sql, entry in statements.items() if sql.startswith("INSERT"))
+        assert insert["rows"] == 2
+
+    def test_slow_log(self, glue):
+        glue.instrument(slow_ms=-1)
+        glue.groups()
+        (slow,) = glue.stats()["slow"]
+        assert "FROM groups" in slow["sql"]
+
+
+class TestDirtiness:
+    def test_mutations_make_dirty(self, glue):
+        assert not glue.dirty
+        glue.add_entry("a", "1")
+        assert glue.dirty
+        glue.dirty = False
+        assert not glue.dirty
+
+    def test_changes_during_save_stay_dirty(self, glue):
+        glue.add_entry("a", "1")
+        revision = glue.revision
+        glue.add_entry("b", "2")
+        glue.mark_saved(revision)
+        assert glue.dirty
+        glue.mark_saved(glue.revision)
+        assert not glue.dirty
+        glue.mark_saved(revision)
+        assert not glue.dirty
+
+    def test_changes_are_reported(self, glue):
+        revisions = []
+        glue.on_change = revisions.append
+        glue.add_entry("a", "1")
+        glue.add_entries([("b", "2"), ("c", "3")])
+        glue.delete_entry(1)
+        glue.dirty = False
+        assert revisions == [1, 2, 3]
+
+
+class TestEntryEvents:
+    @pytest.fixture
+    def events(self, glue):
+        events = []
+        glue.on_entries = lambda kind, ids: events.append((kind, ids))
+        return events
+
+    def test_single_entries(self, glue, events):
+        glue.add_entry("a", "1")
+        glue.edit_entry(1, "a", "2", None, None, None)
+        glue.delete_entry(1)
+        assert events == [(INSERTED, (1,)), (UPDATED, (1,)), (DELETED, (1,))]
+
+    def test_bulk_entries(self, glue, events):
+        glue.add_entries([("a", "1"), ("b", "2"), ("c", "3")])
+        glue.edit_entries([(3, "c", "4"), (1, "a", "5")])
+        glue.delete_entries(iter([2, 3]))
+        glue.delete_entries([42])
+        assert events == [(INSERTED, (1, 2, 3)), (UPDATED, (3, 1)), (DELETED, (2, 3))]
+
+    def test_groups_reset(self, glue, events):
+        glue.add_group("Work", "mail")
+        assert events == []
+        glue.edit_group(1, "Job", "mail")
+        glue.delete_group(1)
+        assert events == [(RESET, ()), (RESET, ())]
+
+    def test_entries_by_ids(self, glue, monkeypatch):
+        monkeypatch.setattr(db, "ID_CHUNK", 2)
+        glue.add_group("Work", "mail")
+        glue.add_entries(
+            [("mail", "1", None, None, 1), ("bank", "2"), ("mailbox", "3", None, None, 1)]
+        )
+        assert sorted(row[2] for row in glue.entries_by_ids([1, 2, 3, 4])) == [1, 2, 3]
+        assert sorted(row[2] for row in glue.entries_by_ids([1, 2, 3], group=1)) == [1, 3]
+        assert [row[2] for row in glue.entries_by_ids([2, 3], text="mail")] == [3]
+
+
+class TestSealing:
+    KEY = b"k" * 32
+
+    def test_roundtrip(self, glue):
+        glue.add_entry("mail", "hunter2", "me")
+        assert glue.seal_secrets(self.KEY) == 1
+        (row,) = glue.entries()
+        assert isinstance(row[4], bytes)
+        assert glue.get_entry(1) == ("mail", "hunter2", "me", None, None)
+        assert glue.secret(1) == "hunter2"
+        assert glue.unseal_secrets() == 1
+        assert glue.entries()[0][4] == "hunter2"
+        assert not glue.sealed
+
+    def test_new_entries_get_sealed(self, glue):
+        glue.seal_secrets(self.KEY)
+        glue.add_entry("a", "1")
+        glue.add_entries([("b", "2"), ("c", "3")])
+        glue.edit_entries([(2, "b", "two")])
+        assert all(isinstance(row[4], bytes) for row in glue.entries())
+        assert [glue.secret(i) for i in (1, 2, 3)] == ["1", "two", "3"]
+
+    def test_survives_serialization(self, glue):
+        glue.add_entry("a", "1")
+        glue.seal_secrets(self.KEY)
+        copy = Glue.from_bytes(glue.to_bytes())
+        with pytest.raises(IncorrectError):
+            copy.secret(1)
+        assert copy.seal_secrets(self.KEY) == 0
+        assert copy.secret(1) == "1"
+        copy.close()
+
+    def test_wrong_key(self, glue):
+        glue.add_entry("a", "1")
+        glue.seal_secrets(self.KEY)
+        glue.seal_secrets(b"x" * 32)
+        with pytest.raises(IncorrectError):
+            glue.secret(1)
+
+    def test_cache_is_bounded(self, glue):
+        glue.seal_secrets(self.KEY)
+        glue.add_entries((str(i), str(i)) for i in range(100))
+        for i in range(1, 101):
+            glue.secret(i)
+        assert len(glue._sealer._cache) == glue._sealer.cache_size
+
+
+class TestFuzzySearch:
+    @pytest.fixture
+    def filled(self, glue):
+        glue.add_group("Work", "mail")
+        glue.add_entries(
+            [
+                ("GitHub", "1", "me", "https://github.com"),
+                ("GitHub Enterprise", "2", "me", "https://ghe.corp", 1),
+                ("Gmail", "3", "me@gmail.com", "https://mail.google.com"),
+                ("Bank", "4", "octocat", None, 1),
+            ]
+        )
+        return glue
+
+    def test_typos(self, filled):
+        assert [row[3] for row in filled.find("gthub")] == ["GitHub", "GitHub Enterprise"]
+        assert filled.find("gmal")[0][3] == "Gmail"
+        assert filled.find("zzzz") == []
+
+    def test_matches_logins_and_websites(self, filled):
+        assert [row[3] for row in filled.find("octocat")] == ["Bank"]
+        assert filled.find("google")[0][3] == "Gmail"
+
+    def test_group_and_limit(self, filled):
+        assert [row[3] for row in filled.find("github", group=1)] == ["GitHub Enterprise"]
+        assert len(filled.find("github", limit=1)) == 1
+
+    def test_follows_changes(self, filled):
+        filled.find("github")
+        filled.edit_entry(1, "GitLab", "1", "me", None, None)
+        filled.delete_entry(2)
+        (identifier,) = filled.add_entries([("Gitea", "5")])
+        assert [row[2] for row in filled.find("gitlab")] == [1]
+        assert filled.find("enterprise") == []
+        assert filled.find("gitea")[0][2] == identifier
+
+    def test_rebuilt_after_reset(self, filled):
+        filled.find("github")
+        filled.query("UPDATE secrets SET name = 'Codeberg' WHERE secretId = 1", fetch=-1)
+        filled.touch()
+        assert filled.find("codeberg")[0][2] == 1
+
+    def test_catches_up_after_building(self, filled, monkeypatch):
+        # Vaults have no readers, so the build mustn't hold the writer while indexing.
+        vault = Glue.from_bytes(filled.to_bytes())
+        built = TrigramIndex.add_many
+
+        edits = []
+
+        def add_many(index, records):
+            built(index, records)
+            if edits:
+                return
+            editor = Thread(target=vault.edit_entry, args=(1, "Codeberg", "1", "me", None, None))
+            edits.append(editor)
+            editor.start()
+            editor.join(timeout=5)
+            assert not editor.is_alive()
+
+        monkeypatch.setattr(TrigramIndex, "add_many", add_many)
+        vault.fuzzy_index()
+        monkeypatch.undo()
+        assert vault.find("codeberg")[0][2] == 1
+        assert [row[2] for row in vault.find("github")] == [2]
+        vault.close()
+
+    def test_ranking_matches_brute_force(self):
+        rng = Random(11)
+
+        def word(n):
+            return "".join(rng.choices("abcd", k=n))
+
+        records = {i: (f"{word(rng.randint(1, 4))} {word(rng.randint(1, 3))}", word(2)) for i in range(1, 3001)}
+        index = TrigramIndex()
+        index.add_many((i, *texts) for i, texts in records.items())
+        for _ in range(100):
+            query = f"{word(rng.randint(1, 3))} {word(rng.randint(1, 3))}" + rng.choice(["", f"  {word(1)}"])
+            wanted = trigrams(query)
+            need = max(1, -(-len(wanted) // 2))
+            scored = []
+            for i, texts in records.items():
+                grams = trigrams(*texts)
+                if len(wanted & grams) >= need:
+                    scored.append((-len(wanted & grams), len(grams), i))
+            ranking = [i for *_, i in sorted(scored)]
+            for limit in (None, 5, 200, 400):
+                assert index.search(query, limit) == ranking[:limit], (query, limit)
+
+
+class TestUrlLookup:
+    @pytest.fixture
+    def filled(self, glue):
+        glue.add_entries(
+            [
+                ("Google", "1", "me", "https://www.google.com/"),
+                ("Gmail", "2", "me", "mail.google.com"),
+                ("Accounts", "3", "me", "HTTPS://Accounts.Google.com:443/signin?next=1"),
+                ("Lookalike", "4", "me", "https://google.com.evil.io"),
+                ("BBC", "5", "me", "https://www.bbc.co.uk"),
+                ("Router", "6", "admin", "http://192.168.1.1/"),
+                ("Notes", "7", "me", "just some notes"),
+            ]
+        )
+        return glue
+
+    def names(self, glue, url):
+        return [row[3] for row in glue.entries_for_url(url)]
+
+    def test_closest_first(self, filled):
+        assert self.names(filled, "https://mail.google.com/inbox") == ["Gmail", "Google", "Accounts"]
+        assert self.names(filled, "google.com") == ["Google", "Gmail", "Accounts"]
+        assert self.names(filled, "https://www.google.com") == ["Google", "Gmail", "Accounts"]
+
+    def test_other_sites(self, filled):
+        assert self.names(filled, "https://evil.io") == ["Lookalike"]
+        assert self.names(filled, "https://news.bbc.co.uk") == ["BBC"]
+        assert self.names(filled, "https://co.uk") == []
+        assert self.names(filled, "192.168.1.1:8080") == ["Router"]
+        assert filled.entries_for_url("not a url") == []
+        assert filled.entries_for_url("https://exa mple.com") == []
+        assert filled.entries_for_url("") == []
+
+    def test_follows_changes(self, filled):
+        filled.edit_entry(2, "Gmail", "2", "me", "https://gmail.com", None)
+        filled.delete_entry(3)
+        assert self.names(filled, "google.com") == ["Google"]
+        assert self.names(filled, "gmail.com") == ["Gmail"]
+        filled.query("UPDATE secrets SET website = 'https://google.com' WHERE secretId = 1", fetch=-1)
+        filled.query("UPDATE secrets SET website = 'https://google.com' WHERE secretId = 7", fetch=-1)
+        # Changed behind its back, an entry goes missing rather than stale until it's touched.
+        assert self.names(filled, "google.com") == []
+        filled.touch()
+        assert self.names(filled, "google.com") == ["Google", "Notes"]
+
+    def test_uses_index(self, filled):
+        plan = filled.query("EXPLAIN QUERY PLAN SELECT * FROM websites WHERE site = 'google.com'", fetch=0)
+        assert "websites_site" in str(plan)
@@ -0,0 +1,72 @@
+from sqlite3 import connect
+
+from ..src.errors import IncorrectError, OutdatedError
+from ..src.models.db import Glue
+from ..src.models.migrant import BASELINE, LATEST, init, upgrade_or_stall, version
+
+import pytest
+
+
+def baseline():
+    conn = connect(":memory:")
+    conn.executescript(BASELINE)
+    return conn
+
+
+class TestMigrations:
+    def test_init_is_latest(self):
+        conn = connect(":memory:")
+        init(conn)
+        assert version(conn) == LATEST
+        assert not upgrade_or_stall(conn)
+
+    def test_upgrade_adds_indexes(self):
+        conn = baseline()
+        conn.execute("INSERT INTO secrets (name, secret, website) VALUES ('GitHub', 'x', 'github.com')")
+        conn.commit()
+        assert upgrade_or_stall(conn)
+        assert version(conn) == LATEST
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"secrets_group", "secrets_name", "secrets_website"} <= indexes
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM secrets WHERE groupId = 1").fetchall()
+        assert "secrets_group" in str(plan)
+
+    def test_upgrade_on_open(self):
+        conn = baseline()
+        conn.execute("INSERT INTO secrets (name, secret, website) VALUES ('GitHub', 'x', 'github.com')")
+        conn.commit()
+        glue = Glue.from_bytes(conn.serialize())
+        assert glue.dirty
+        assert [row[3] for row in glue.entries(text="git")] == ["GitHub"]
+        glue.close()
+
+    def test_upgrade_indexes_websites(self):
+        conn = baseline()
+        conn.execute("INSERT INTO secrets (name, secret, website) VALUES ('Gmail', 'x', 'https://mail.google.com')")
+        conn.execute("INSERT INTO secrets (name, secret, website) VALUES ('Notes', 'x', 'no website')")
+        conn.commit()
+        glue = Glue.from_bytes(conn.serialize())
+        assert [row[3] for row in glue.entries_for_url("google.com")] == ["Gmail"]
+        glue.close()
+
+    def test_other_clients_can_write(self):
+        glue = Glue.new()
+        glue.add_entry("Gmail", "x", "me", "https://mail.google.com")
+        conn = connect(":memory:")
+        conn.deserialize(glue.to_bytes())
+        glue.close()
+        conn.execute("INSERT INTO secrets (name, secret, website) VALUES ('GitHub', 'x', 'github.com')")
+        conn.execute("UPDATE secrets SET website = 'gmail.com' WHERE name = 'Gmail'")
+        conn.commit()
+        assert conn.execute("SELECT count(*) FROM websites").fetchone() == (0,)
+
+    def test_stall_on_newer(self):
+        conn = baseline()
+        conn.execute("INSERT INTO db_version (version) VALUES ('99.0.0')")
+        with pytest.raises(OutdatedError):
+            upgrade_or_stall(conn)
+        assert version(conn) == "99.0.0"
+
+    def test_foreign_db(self):
+        with pytest.raises(IncorrectError):
+            upgrade_or_stall(connect(":memory:"))